@@ -3,6 +3,8 @@ import pandas as pd
 
 import utils.helpers as hp
 import utils.build_teams as bt
+import utils.transitions as tr
+import calculations.utils.excess_probabilities as ep
 
 
 def remove_hash(data: dict) -> dict:
@@ -1084,3 +1086,815 @@ def test_other():
             },
         },
     }
+
+
+### Build modes
+
+# The top supervisor has no supervisor, so SUPERVISOR MASTERKEY is float
+top_supervisor_df_dict = {
+    "20120131": pd.DataFrame(
+        {
+            "MASTERKEY": [33, 34, 244, 999],
+            "SUPERVISOR MASTERKEY": [244, 244, 999, None],
+            "UIC": [1, 1, 2, 3],
+        }
+    ),
+    "20120228": pd.DataFrame(
+        {
+            "MASTERKEY": [33, 34, 35, 244, 999],
+            "SUPERVISOR MASTERKEY": [244, 244, 244, 999, None],
+            "UIC": [1, 1, 1, 2, 3],
+        }
+    ),
+}
+
+all_df_dicts = [
+    non_terminal_df_dict,
+    becoming_non_terminal_df_dict,
+    uncoordinated_move_df_dict,
+    supervisor_departure_move_df_dict,
+    supe_swap_df_dict,
+    coordinated_move_df_dict,
+    dual_arrival_df_dict,
+    dual_exit_df_dict,
+    supe_leave_df_dict,
+    new_team_df_dict,
+    splinter_df_dict,
+    team_split_df_dict,
+    team_merger_df_dict,
+    self_supervisor_df_dict,
+    top_supervisor_df_dict,
+]
+
+
+def remove_team_hash(team_dict: dict) -> list:
+    """removes the uid and hash keys of a team dict for testing
+
+    Args:
+        team_dict (dict): teams found in a month
+
+    Returns:
+        list: list of teams without the hash key
+    """
+    return [
+        {k: v for k, v in team.items() if k != "hash"} for team in team_dict.values()
+    ]
+
+
+def link_over_time(
+    df_dict: dict, months: list, grouped: bool = False, **kwargs
+) -> dict:
+    """links the months of df_dict and returns the teams over time without
+    the hash key, for comparing linking modes
+
+    Args:
+        df_dict (dict): month: pd.DataFrame
+        months (list): months to link
+        grouped (bool, optional): use the grouped build. Defaults to False.
+        **kwargs: passed to LinkedTeams
+
+    Returns:
+        dict: teams over time dictionary without the hash key
+    """
+    linked_teams = bt.LinkedTeams(df_dict, months, **kwargs)
+    linked_teams.create_team_dicts(grouped=grouped)
+    teams_over_time = hp.build_teams_over_time(
+        linked_teams.build_linked_team_dict(),
+        linked_teams.team_dicts_by_month,
+        months,
+    )
+    if linked_teams.compact:
+        teams_over_time = {
+            team_num: {
+                month: team.to_dict(linked_teams.key_codes)
+                for month, team in teams.items()
+            }
+            for team_num, teams in teams_over_time.items()
+        }
+
+    return remove_hash(teams_over_time)
+
+
+def test_grouped_build():
+    """The grouped build should find the same teams as the original build"""
+
+    for df_dict in all_df_dicts:
+        for df in df_dict.values():
+            assert remove_team_hash(bt.build_team_dict(df)) == remove_team_hash(
+                bt.build_team_dict(df, grouped=True)
+            )
+
+    # The supervisor's UIC is read from a float row and dropped in both builds
+    for df in top_supervisor_df_dict.values():
+        team_dict = bt.build_team_dict(df, id_prefix="month")
+        assert team_dict == bt.build_team_dict(df, grouped=True, id_prefix="month")
+        assert [team["uic"] for team in team_dict.values()] == [[1]]
+
+
+def test_coordinated_cache():
+    """Repeated coordinated checks should be answered from the cache"""
+
+    linked_teams = bt.LinkedTeams(coordinated_move_df_dict, ["20120131", "20120228"])
+
+    first = linked_teams.determine_coordinated([35, 36], "20120228")
+    second = linked_teams.determine_coordinated([36, 35], "20120228")
+
+    assert first == second
+    assert linked_teams.coordinated_cache_misses == 1
+    assert linked_teams.coordinated_cache_hits == 1
+
+    linked_teams = bt.LinkedTeams(
+        coordinated_move_df_dict, ["20120131", "20120228"], coordinated_cache_size=0
+    )
+    linked_teams.determine_coordinated([35, 36], "20120228")
+    assert len(linked_teams.coordinated_cache) == 0
+
+
+def test_compact_teams():
+    """Compact teams should link the same as team dicts"""
+
+    for df_dict in all_df_dicts:
+        months = list(df_dict)
+        assert link_over_time(df_dict, months, compact=True) == link_over_time(
+            df_dict, months
+        )
+
+
+def test_stable_hash():
+    """Stable hashes should not depend on the row order or the key dtype
+    and should link the same as python hashes"""
+
+    assert bt.stable_team_hash(244, [33, 34, 35], ["A"]) == bt.stable_team_hash(
+        244.0, [35.0, 33.0, 34.0], ["A"]
+    )
+    assert bt.stable_team_hash(244, [33, 34, 35], ["A"]) != bt.stable_team_hash(
+        344, [33, 34, 35], ["A"]
+    )
+
+    for df_dict in all_df_dicts:
+        months = list(df_dict)
+        assert link_over_time(
+            df_dict, months, grouped=True, hash_mode="stable"
+        ) == link_over_time(df_dict, months)
+
+
+def test_parallel_build():
+    """Months built in a process pool should match months built in order"""
+
+    months = list(splinter_df_dict)
+    linked_teams = bt.LinkedTeams(splinter_df_dict, months, hash_mode="stable")
+    linked_teams.create_team_dicts(grouped=True)
+
+    parallel_teams = bt.LinkedTeams(splinter_df_dict, months, hash_mode="stable")
+    parallel_teams.create_team_dicts(grouped=True, workers=2)
+
+    assert list(parallel_teams.team_dicts_by_month) == months
+    for month in months:
+        assert list(parallel_teams.team_dicts_by_month[month].values()) == list(
+            linked_teams.team_dicts_by_month[month].values()
+        )
+
+    with pytest.raises(ValueError):
+        bt.LinkedTeams(splinter_df_dict, months).create_team_dicts(workers=2)
+
+
+def test_deterministic_ids():
+    """Deterministic uids should be the same for every run"""
+
+    months = list(team_split_df_dict)
+    runs = []
+    for _ in range(2):
+        linked_teams = bt.LinkedTeams(team_split_df_dict, months, deterministic_ids=True)
+        linked_teams.create_team_dicts()
+        runs.append(linked_teams.build_linked_team_dict())
+
+    assert runs[0] == runs[1]
+    assert list(runs[0]) == [
+        "20120131-000000",
+        "20120131-000001",
+        "20120228-000000",
+        "20120228-000001",
+    ]
+    assert runs[0]["20120131-000001"]["team_uuids"] == [
+        "20120131-000001",
+        "20120228-000002",
+    ]
+
+    allocator = bt.TeamIdAllocator("20120131")
+    assert allocator.new_id(taken={"20120131-000000"}) == "20120131-000001"
+
+
+def test_team_dict_cache(tmp_path):
+    """Cached months should be loaded instead of being built again"""
+
+    months = list(team_merger_df_dict)
+    linked_teams = bt.LinkedTeams(
+        team_merger_df_dict,
+        months,
+        hash_mode="stable",
+        deterministic_ids=True,
+        cache_dir=str(tmp_path),
+    )
+    linked_teams.create_team_dicts()
+    assert len(list(tmp_path.iterdir())) == 2
+
+    cached_teams = bt.LinkedTeams(
+        team_merger_df_dict,
+        months,
+        hash_mode="stable",
+        deterministic_ids=True,
+        cache_dir=str(tmp_path),
+    )
+    cached_teams.create_team_dicts()
+    assert cached_teams.team_dicts_by_month == linked_teams.team_dicts_by_month
+    assert (
+        cached_teams.build_linked_team_dict() == linked_teams.build_linked_team_dict()
+    )
+
+    # Changed data is built again
+    changed_df_dict = {month: df.copy() for month, df in team_merger_df_dict.items()}
+    changed_df_dict[months[0]].loc[0, "UIC"] = 3
+    changed_teams = bt.LinkedTeams(
+        changed_df_dict, months, hash_mode="stable", cache_dir=str(tmp_path)
+    )
+    changed_teams.create_team_dicts()
+    assert len(list(tmp_path.iterdir())) == 4
+
+    with pytest.raises(ValueError):
+        bt.LinkedTeams(team_merger_df_dict, months, cache_dir=str(tmp_path))
+
+
+def test_compact_team_dict_cache(tmp_path, capsys):
+    """Compact months should still load from the cache when another month
+    adds new people"""
+
+    months = list(team_merger_df_dict)
+    first_month = {months[0]: team_merger_df_dict[months[0]]}
+    linked_teams = bt.LinkedTeams(
+        first_month,
+        months[:1],
+        compact=True,
+        hash_mode="stable",
+        cache_dir=str(tmp_path),
+    )
+    linked_teams.create_team_dicts()
+
+    new_person = team_merger_df_dict[months[1]].copy()
+    new_person.loc[len(new_person)] = [99, 244, 1]
+    cached_teams = bt.LinkedTeams(
+        {months[0]: team_merger_df_dict[months[0]], months[1]: new_person},
+        months,
+        compact=True,
+        hash_mode="stable",
+        cache_dir=str(tmp_path),
+    )
+    capsys.readouterr()
+    cached_teams.create_team_dicts()
+    assert "loading month - {}".format(months[0]) in capsys.readouterr().out
+
+    expected = bt.LinkedTeams(
+        {months[0]: team_merger_df_dict[months[0]], months[1]: new_person},
+        months,
+        compact=True,
+        hash_mode="stable",
+    )
+    expected.create_team_dicts()
+    for month in months:
+        assert [
+            team.to_dict(cached_teams.key_codes)
+            for team in cached_teams.team_dicts_by_month[month].values()
+        ] == [
+            team.to_dict(expected.key_codes)
+            for team in expected.team_dicts_by_month[month].values()
+        ]
+
+
+three_month_df_dict = {
+    "20120131": dual_exit_df_dict["20120131"],
+    "20120228": dual_exit_df_dict["20120228"],
+    "20120331": splinter_df_dict["20120228"],
+}
+
+
+def test_append_month(tmp_path):
+    """Appending months one at a time, with the state saved in between,
+    should link the same as linking every month at once"""
+
+    months = list(three_month_df_dict)
+    df_dict = three_month_df_dict
+
+    linked_teams = bt.LinkedTeams(
+        df_dict, months, hash_mode="stable", deterministic_ids=True
+    )
+    linked_teams.create_team_dicts()
+    linked_teams.build_linked_team_dict()
+
+    appended_teams = bt.LinkedTeams(
+        {}, [], hash_mode="stable", deterministic_ids=True
+    )
+    for month in months:
+        appended_teams.append_month(month, df_dict[month])
+        appended_teams.save_state(str(tmp_path / "state.pkl"))
+        appended_teams = bt.LinkedTeams.load_state(str(tmp_path / "state.pkl"))
+
+    assert appended_teams.linked_teams == linked_teams.linked_teams
+    assert appended_teams.team_dicts_by_month == linked_teams.team_dicts_by_month
+    assert appended_teams.month_list == months
+
+    with pytest.raises(ValueError):
+        appended_teams.append_month("20120131", df_dict["20120131"])
+
+    # Compact teams keep their codes as new people appear
+    compact_teams = bt.LinkedTeams(
+        {}, [], compact=True, hash_mode="stable", deterministic_ids=True
+    )
+    for month in months:
+        compact_teams.append_month(month, df_dict[month])
+    for table, expected in zip(compact_teams.to_tables(), linked_teams.to_tables()):
+        assert table.equals(expected)
+
+    key_codes = bt.extend_key_codes(
+        compact_teams.key_codes,
+        pd.DataFrame({"MASTERKEY": [1, 33], "SUPERVISOR MASTERKEY": [244, 244]}),
+    )
+    assert key_codes[-1] == 1
+    assert bt.encode_keys([1, 33, 844], key_codes).tolist() == [
+        len(key_codes) - 1,
+        0,
+        len(key_codes) - 2,
+    ]
+
+
+def test_checkpoint_resume(tmp_path, monkeypatch):
+    """Resuming from a checkpoint should give the same linked teams as a run
+    that was not interrupted"""
+
+    months = list(three_month_df_dict)
+    df_dict = three_month_df_dict
+    checkpoint_path = str(tmp_path / "checkpoint.pkl")
+
+    linked_teams = bt.LinkedTeams(
+        df_dict, months, hash_mode="stable", deterministic_ids=True
+    )
+    linked_teams.create_team_dicts()
+    full_run = linked_teams.build_linked_team_dict()
+
+    # Crash while linking the last month
+    crashing_teams = bt.LinkedTeams(
+        df_dict, months, hash_mode="stable", deterministic_ids=True
+    )
+    crashing_teams.create_team_dicts()
+    link_month = crashing_teams.link_month
+
+    def crash(month):
+        if month == "20120331":
+            raise RuntimeError("crash")
+        link_month(month)
+
+    monkeypatch.setattr(crashing_teams, "link_month", crash)
+    with pytest.raises(RuntimeError):
+        crashing_teams.build_linked_team_dict(checkpoint_path, checkpoint_every=1)
+
+    resumed_teams = bt.LinkedTeams.load_state(checkpoint_path, df_dict)
+    assert resumed_teams.last_linked_month == "20120228"
+    assert resumed_teams.resume_linked_team_dict() == full_run
+
+    # Bad checkpoint options fail before any month is linked
+    python_hash_teams = bt.LinkedTeams(df_dict, months)
+    python_hash_teams.create_team_dicts()
+    with pytest.raises(ValueError):
+        python_hash_teams.build_linked_team_dict(checkpoint_path)
+    assert python_hash_teams.last_linked_month is None
+    with pytest.raises(ValueError):
+        crashing_teams.build_linked_team_dict(checkpoint_path, checkpoint_every=0)
+    with pytest.raises(ValueError):
+        bt.LinkedTeams(df_dict, months).resume_linked_team_dict()
+
+
+def test_link_stream(tmp_path):
+    """Streaming months from files should link the same as linking every
+    month at once while only keeping a window of months"""
+
+    import utils.loaders as ld
+
+    months = list(three_month_df_dict)
+    df_dict = three_month_df_dict
+    for month, df in df_dict.items():
+        df.to_csv(tmp_path / "{}.csv".format(month), index=False)
+
+    linked_teams = bt.LinkedTeams(df_dict, months, deterministic_ids=True)
+    linked_teams.create_team_dicts()
+    linked_teams.build_linked_team_dict()
+
+    streamed_teams = bt.LinkedTeams({}, [], deterministic_ids=True)
+    streamed_teams.link_stream(ld.read_month_files(str(tmp_path)), window=2)
+
+    assert remove_hash(
+        hp.build_teams_over_time(
+            streamed_teams.linked_teams, streamed_teams.team_dicts_by_month, months
+        )
+    ) == remove_hash(
+        hp.build_teams_over_time(
+            linked_teams.linked_teams, linked_teams.team_dicts_by_month, months
+        )
+    )
+    assert list(streamed_teams.df_dict) == ["20120228", "20120331"]
+
+    # month_list can be filled in up front
+    listed_teams = bt.LinkedTeams({}, months, deterministic_ids=True)
+    listed_teams.link_stream(ld.read_month_files(str(tmp_path)), window=2)
+    assert listed_teams.linked_teams == streamed_teams.linked_teams
+    assert list(listed_teams.df_dict) == ["20120228", "20120331"]
+
+    # A skipped month can not be linked
+    skipped_teams = bt.LinkedTeams({}, months, deterministic_ids=True)
+    skipped_teams.append_month(months[0], df_dict[months[0]])
+    with pytest.raises(ValueError):
+        skipped_teams.append_month(months[2], df_dict[months[2]])
+
+
+def test_parquet_months(tmp_path):
+    """Months loaded from a partitioned parquet dataset should link the same
+    as the original data"""
+
+    pytest.importorskip("pyarrow")
+    import utils.loaders as ld
+
+    months = list(dual_exit_df_dict)
+    for month, df in dual_exit_df_dict.items():
+        partition = tmp_path / "month={}".format(month)
+        partition.mkdir()
+        df.assign(OTHER=0).to_parquet(partition / "part-0.parquet")
+
+    df_dict = ld.load_parquet_months(str(tmp_path))
+    assert list(df_dict) == months
+    assert list(df_dict[months[0]].columns) == ld.TEAM_COLUMNS
+    assert df_dict[months[0]]["MASTERKEY"].dtype == "int32"
+    assert df_dict[months[0]]["UIC"].dtype == "category"
+
+    assert link_over_time(df_dict, months) == link_over_time(dual_exit_df_dict, months)
+
+
+def test_compact_team_columns():
+    """Keys should only be downcast to int32 when no key changes"""
+
+    import utils.loaders as ld
+
+    df = ld.compact_team_columns(
+        pd.DataFrame(
+            {
+                "MASTERKEY": [33, 34],
+                "SUPERVISOR MASTERKEY": [244, None],
+                "UIC": [1, 1],
+            }
+        )
+    )
+    assert df["MASTERKEY"].dtype == "int32"
+    assert df["SUPERVISOR MASTERKEY"].dtype == "float64"
+
+    df = ld.compact_team_columns(
+        pd.DataFrame(
+            {
+                "MASTERKEY": [3_000_000_000, 34],
+                "SUPERVISOR MASTERKEY": [244.0, 1.5],
+                "UIC": [1, 1],
+            }
+        )
+    )
+    assert df["MASTERKEY"].to_list() == [3_000_000_000, 34]
+    assert df["SUPERVISOR MASTERKEY"].to_list() == [244.0, 1.5]
+
+
+def test_terminal_team_table():
+    """Terminal teams found at once should match the per supervisor check"""
+
+    df = pd.DataFrame(
+        {
+            "MASTERKEY": [888, 33, 34, 35, 36, 244],
+            "SUPERVISOR MASTERKEY": [888, 244, 888, 344, 344, 344],
+            "UIC": [1, 1, 1, 2, 2, 2],
+        }
+    )
+    table = bt.determine_terminal_team_table(df)
+
+    assert table["SUPERVISOR MASTERKEY"].to_list() == [888, 244]
+    assert table["MASTERKEY"].to_list() == [34, 33]
+
+    supervisor_keys = bt.build_supervisor_list(df)
+    for supervisor in supervisor_keys:
+        team_members = table[table["SUPERVISOR MASTERKEY"] == supervisor][
+            "MASTERKEY"
+        ].to_list()
+        assert (team_members or None) == bt.determine_terminal_teams(
+            df, supervisor, supervisor_keys
+        )
+
+
+def test_sparse_linking():
+    """Linking with sparse overlap counts should match the index linking"""
+
+    pytest.importorskip("scipy")
+
+    overlap_matrix = bt.build_overlap_matrix([{1, 2, 3}, {4}], [{2, 3}, {5}, {3, 4}])
+    assert overlap_matrix.toarray().tolist() == [[2, 0, 1], [0, 0, 1]]
+
+    for df_dict in all_df_dicts:
+        months = list(df_dict)
+        assert link_over_time(df_dict, months, linking="sparse") == link_over_time(
+            df_dict, months
+        )
+
+
+def test_resolve_optimal_matches():
+    """Two prior teams claiming the same optimal match should be reported
+    as a conflict instead of both being matched"""
+
+    linked_teams = bt.LinkedTeams({}, ["20120131", "20120228"])
+    linked_teams.team_dicts_by_month = {
+        "20120228": {
+            "c": bt.create_team(244, [33, 34, 37], [1]),
+            "d": bt.create_team(644, [38], [2]),
+        }
+    }
+    linked_teams.linked_teams = {
+        "a": bt.create_linked_team(
+            {"20120131": {"a": bt.create_team(244, [33, 34, 35], [1])}},
+            "20120131",
+            "a",
+        ),
+        "b": bt.create_linked_team(
+            {"20120131": {"b": bt.create_team(344, [33, 37, 38], [2])}},
+            "20120131",
+            "b",
+        ),
+    }
+    linked_teams.new_teams_by_month = {
+        "20120228": dict(linked_teams.team_dicts_by_month["20120228"])
+    }
+
+    possible_teams = {"a": ["c"], "b": ["c", "d"]}
+    overlap_sizes = {("a", "c"): 2, ("b", "c"): 2, ("b", "d"): 1}
+
+    for sizes in [None, overlap_sizes]:
+        matches, conflicts = linked_teams.resolve_optimal_matches(
+            possible_teams, "20120228", sizes
+        )
+        assert matches == {"a": "c"}
+        assert conflicts == [{"prior": "b", "match": "c", "claimed_by": "a"}]
+
+
+def test_teams_over_time_long_format():
+    """The long format should have one row per team and month"""
+
+    months = list(team_split_df_dict)
+    linked_teams = bt.LinkedTeams(team_split_df_dict, months)
+    linked_teams.create_team_dicts()
+    temp_link_teams = linked_teams.build_linked_team_dict()
+
+    teams_over_time = hp.build_teams_over_time(
+        temp_link_teams, linked_teams.team_dicts_by_month, months
+    )
+    long_teams = hp.build_teams_over_time(
+        temp_link_teams, linked_teams.team_dicts_by_month, months, long_format=True
+    )
+
+    assert len(long_teams) == sum(len(teams) for teams in teams_over_time.values())
+    assert long_teams["team"].to_list() == [0, 1, 1, 2, 3]
+    assert long_teams["month"].to_list() == [
+        "20120131",
+        "20120131",
+        "20120228",
+        "20120228",
+        "20120228",
+    ]
+    assert long_teams["team_members"].to_list()[3:] == [[33, 34], [35, 36]]
+
+
+def test_to_tables(tmp_path):
+    """The tables should hold the same teams as the teams over time"""
+
+    months = list(team_split_df_dict)
+    for compact in [False, True]:
+        linked_teams = bt.LinkedTeams(team_split_df_dict, months, compact=compact)
+        linked_teams.create_team_dicts()
+        linked_teams.build_linked_team_dict()
+        team_table, member_table = linked_teams.to_tables()
+
+        assert team_table["lineage_id"].to_list() == [
+            lineage_id
+            for lineage_id, lt in linked_teams.linked_teams.items()
+            for _ in lt["team_uuids"]
+        ]
+        assert team_table["supervisor"].to_list() == [244, 344, 344, 244, 744]
+        assert team_table["team_size"].to_list() == [5, 4, 4, 3, 3]
+        assert team_table["uic"].to_list() == [[1], [2], [2], [1], [1]]
+        assert len(member_table) == (team_table["team_size"] - 1).sum()
+        assert member_table[member_table["month"] == "20120228"][
+            "MASTERKEY"
+        ].to_list() == [37, 38, 39, 33, 34, 35, 36]
+
+        long_format = hp.build_teams_over_time(
+            linked_teams.linked_teams,
+            linked_teams.team_dicts_by_month,
+            months,
+            long_format=True,
+        )
+        assert team_table["month"].to_list() == long_format["month"].to_list()
+        assert team_table["team_size"].to_list() == (
+            long_format["team_size"].to_list()
+        )
+
+    pytest.importorskip("pyarrow")
+    linked_teams.write_parquet(str(tmp_path))
+    assert pd.read_parquet(tmp_path / "members.parquet").equals(member_table)
+
+
+def test_transition_table():
+    """Moves between linked teams should be in the tr_df layout"""
+
+    ocs_df_dict = {
+        month: df.assign(OCS=[1, 1, 1, 1 + idx, 2, 2, 2])
+        for idx, (month, df) in enumerate(uncoordinated_move_df_dict.items())
+    }
+    months = list(ocs_df_dict)
+    linked_teams = bt.LinkedTeams(ocs_df_dict, months)
+    linked_teams.create_team_dicts()
+    linked_teams.build_linked_team_dict()
+
+    records = tr.build_transition_records(linked_teams, ocs_column="OCS")
+    assert records[["i", "j", "month", "person", "following"]].values.tolist() == [
+        [0, 1, 1, 36, 0]
+    ]
+
+    tr_df = tr.build_tr_df(records)
+    assert list(tr_df.columns) == ["i", "j", "1"]
+    assert tr_df["1"].to_list() == [(36, 0)]
+    assert tr.build_tr_df(records, kind="ocs")["1"].to_list() == [(1, 2)]
+
+    # People moving together are following
+    linked_teams = bt.LinkedTeams(coordinated_move_df_dict, months)
+    linked_teams.create_team_dicts()
+    linked_teams.build_linked_team_dict()
+    records = tr.build_transition_records(linked_teams)
+    assert records["following"].to_list() == [1] * 7
+
+    with pytest.raises(ValueError):
+        tr.build_tr_df(records, kind="moves")
+
+    # Moves of a pair are packed into as many rows as its most moves in a month
+    records = pd.DataFrame(
+        {
+            "i": [0, 0, 0, 1, 0],
+            "j": [1, 1, 1, 2, 1],
+            "month": [1, 1, 2, 1, 3],
+            "person": [33, 34, 35, 36, 37],
+            "following": [0, 1, 0, 0, 1],
+        }
+    )
+    tr_df = tr.build_tr_df(records)
+    assert tr_df[["i", "j"]].values.tolist() == [[0, 1], [0, 1], [1, 2]]
+    assert tr_df["2"].to_list()[0] == (35, 0)
+    assert list(ep.build_following_networks(tr_df).edges(data=True)) == [
+        (0, 1, {"people": [33, 35, 37, 34], "following": [0, 0, 1, 1]}),
+        (1, 2, {"people": [36], "following": [0]}),
+    ]
+
+
+def test_following_networks():
+    """Edges should hold the people and following of every transition in
+    row then month order"""
+
+    tr_df = pd.DataFrame(
+        {
+            "i": [0, 1, 0],
+            "j": [1, 2, 1],
+            "1": [(33, 1), None, (35, 0)],
+            "2": [(34, 0), (36, 1), None],
+        }
+    )
+    g = ep.build_following_networks(tr_df)
+
+    assert list(g.edges(data=True)) == [
+        (0, 1, {"people": [33, 34, 35], "following": [1, 0, 0]}),
+        (1, 2, {"people": [36], "following": [1]}),
+    ]
+    assert ep.build_following_networks(tr_df[["i", "j"]]).number_of_edges() == 0
+
+
+def test_ocs_networks():
+    """Edges should hold the ocs transitions in row then month order"""
+
+    tr_df = pd.DataFrame(
+        {
+            "i": [0, 1, 0],
+            "j": [1, 2, 1],
+            "1": [("0301", "0343"), None, ("0343", "0343")],
+            "2": [None, ("2210", "0301"), ("0301", "2210")],
+        }
+    )
+    g = ep.build_ocs_networks(tr_df)
+
+    assert list(g.edges(data=True)) == [
+        (
+            0,
+            1,
+            {
+                "ocs_transition": [
+                    ("0301", "0343"),
+                    ("0343", "0343"),
+                    ("0301", "2210"),
+                ]
+            },
+        ),
+        (1, 2, {"ocs_transition": [("2210", "0301")]}),
+    ]
+
+
+window_tr_df = pd.DataFrame(
+    {
+        "i": [0, 1, 0, 2],
+        "j": [1, 2, 1, 0],
+        "1": [(33, 1), None, (35, 0), None],
+        "2": [(34, 0), (36, 1), None, (37, 0)],
+        "3": [None, None, (38, 1), (39, 1)],
+        "4": [(40, 0), (41, 0), None, None],
+    }
+)
+
+
+def edges(g):
+    return list(g.edges(data=True))
+
+
+def test_transition_index():
+    """Networks from the index should match the networks from the tr_df
+    while sweeping t"""
+
+    for kind, create in [
+        ("following", ep.create_following_attribute_networks),
+        ("ocs", ep.create_ocs_attribute_networks),
+    ]:
+        index = ep.TransitionIndex(window_tr_df, kind=kind)
+        for t in [0, 1, 2, 3, 4, 2]:
+            left_g, right_g, left, right = create(index, t, 2, 1)
+            expected = create(window_tr_df, t, 2, 1)
+            assert edges(left_g) == edges(expected[0])
+            assert edges(right_g) == edges(expected[1])
+            assert (left, right) == expected[2:]
+
+    with pytest.raises(ValueError):
+        ep.TransitionIndex(window_tr_df, kind="moves")
+    with pytest.raises(ValueError):
+        ep.create_following_attribute_networks(
+            ep.TransitionIndex(window_tr_df, kind="ocs"), 2, 2
+        )
+    with pytest.raises(ValueError):
+        ep.create_ocs_attribute_networks(ep.TransitionIndex(window_tr_df), 2, 2)
+
+
+def test_array_digraph():
+    """The array graph should match networkx for the rewires and calculations"""
+
+    graph = ep.ArrayDiGraph.from_edges(
+        [0, 1, 0, 2, 3, 1, 2, 0], [1, 2, 1, 0, 1, 3, 3, 2]
+    )
+    nx_graph = graph.to_networkx()
+
+    assert list(nx_graph.edges(data="weight")) == [
+        (0, 1, 2),
+        (0, 2, 1),
+        (1, 2, 1),
+        (1, 3, 1),
+        (2, 0, 1),
+        (2, 3, 1),
+        (3, 1, 1),
+    ]
+    assert list(ep.ArrayDiGraph.from_networkx(nx_graph).edges) == list(nx_graph.edges)
+    assert graph.degree(1) == nx_graph.degree(1)
+    assert set(graph.predecessors(1)) == {0, 3}
+    assert (0, 1) in graph.edges and (1, 0) not in graph.edges
+
+    for with_self_loops in [False, True]:
+        rewired = ep.preserve_strength(
+            graph, use_seed=3, with_self_loops=with_self_loops
+        )
+        nx_rewired = ep.preserve_strength(
+            nx_graph, use_seed=3, with_self_loops=with_self_loops
+        )
+        assert list(rewired.to_networkx().edges(data="weight")) == list(
+            nx_rewired.edges(data="weight")
+        )
+
+    assert ep.calculate_z_m(graph, graph, rewired, [0, 1, 4]) == ep.calculate_z_m(
+        nx_graph, nx_graph, nx_rewired, [0, 1, 4]
+    )
+    assert ep.calculate_y_m_numerator(graph, rewired) == (
+        ep.calculate_y_m_numerator(nx_graph, nx_rewired)
+    )
+
+    left_g, right_g, _, _ = ep.TransitionIndex(window_tr_df).array_networks(2, 2)
+    assert list(left_g.to_networkx().edges(data="weight")) == [
+        (0, 1, 3),
+        (1, 2, 1),
+        (2, 0, 1),
+    ]
@@ -51,6 +51,74 @@ def determine_n_star_teams(two_nets: list, W: int = 1) -> list:
     return N_star
 
 
+def melt_transitions(df: pd.DataFrame) -> pd.DataFrame:
+    """Melts the month columns of a transition data frame into one row per
+    transition. Rows are kept in the order of the data frame, and the months of
+    a row in the order of the columns.
+
+    Args:
+        df (pd.DataFrame): data frame with transition information
+
+    Returns:
+        pd.DataFrame: i, j, transition, row (position of the row in df) and month
+    """
+
+    n_months = len(df.columns) - 2
+    transitions = df.iloc[:, 2:].to_numpy(dtype=object).ravel()
+    keep = ~pd.isna(transitions)
+
+    return pd.DataFrame(
+        {
+            "i": np.repeat(df["i"].to_numpy(), n_months)[keep],
+            "j": np.repeat(df["j"].to_numpy(), n_months)[keep],
+            "transition": transitions[keep],
+            "row": np.repeat(np.arange(len(df)), n_months)[keep],
+            "month": np.tile(np.asarray(df.columns[2:], dtype=object), len(df))[keep],
+        }
+    )
+
+
+def determine_window_months(columns: list, t: int, delta_t: int, g: int = 0) -> tuple:
+    """Determines the month columns of T_< and T_>
+
+    Args:
+        columns (list): columns of the transition dataframe
+        t (int): month t, the end of T_<
+        delta_t (int): the width of the interval
+        g (int, optional): a gap between T< and T>. Defaults to 0.
+
+    Returns:
+        tuple: month columns of T_< and T_>
+    """
+
+    left = [str(i) for i in range(t - delta_t + 1, t + 1) if str(i) in columns]
+    right = [str(i) for i in range(t + 1 + g, t + delta_t + g + 1) if str(i) in columns]
+
+    return left, right
+
+
+def transition_edge_attributes(transitions: list, kind: str = "following") -> dict:
+    """Creates the edge attributes for the transitions of an edge
+
+    Args:
+        transitions (list): (person, following) or (from, to) ocs tuples
+        kind (str, optional): "following" or "ocs". Defaults to "following".
+
+    Returns:
+        dict: people and following, or ocs_transition
+    """
+
+    if kind == "following":
+        return {
+            "people": [transition[0] for transition in transitions],
+            "following": [transition[1] for transition in transitions],
+        }
+    elif kind == "ocs":
+        return {"ocs_transition": transitions}
+    else:
+        raise ValueError("kind must be 'following' or 'ocs'")
+
+
 def build_following_networks(df: pd.DataFrame) -> nx.DiGraph:
     """Builds a network with attributes of following and the person who moved
 
@@ -63,25 +131,23 @@ def build_following_networks(df: pd.DataFrame) -> nx.DiGraph:
 
     g = nx.DiGraph()
 
-    for idx, row in df.iterrows():
-        for col in df.columns[2:]:
-            if not pd.isna(row[col]):
-                if g.has_edge(row["i"], row["j"]):
-                    g[row["i"]][row["j"]]["people"].append(row[col][0])
-                    g[row["i"]][row["j"]]["following"].append(row[col][1])
-                else:
-                    g.add_edge(
-                        row["i"],
-                        row["j"],
-                        people=[row[col][0]],
-                        following=[row[col][1]],
-                    )
+    # One list of transitions per edge, in the order the edges are first found
+    edges = (
+        melt_transitions(df)
+        .groupby(["i", "j"], sort=False, dropna=False)["transition"]
+        .agg(list)
+    )
+
+    g.add_edges_from(
+        (i, j, transition_edge_attributes(transitions, "following"))
+        for (i, j), transitions in edges.items()
+    )
 
     return g
 
 
 def create_following_attribute_networks(
-    tr_df: pd.DataFrame,
+    tr_df: Union[pd.DataFrame, "TransitionIndex"],
     t: int,
     delta_t: int,
     g: int = 0,
@@ -91,7 +157,8 @@ def create_following_attribute_networks(
     T< and T>
 
     Args:
-        tr_df (pd.DataFrame): a dataframe that contains the transitions between two locations
+        tr_df (Union[pd.DataFrame, TransitionIndex]): a dataframe that contains the
+            transitions between two locations, or a following TransitionIndex of it
         t (int): month t which will be the center of the interval of observed
         months. in case of a gap, it will be the end of T<
         delta_t (int): the width of the interval
@@ -102,10 +169,12 @@ def create_following_attribute_networks(
         Union[tuple,list]: list of networkx DiGraph directed networks for T< and T>
     """
 
-    left = [str(i) for i in range(t - delta_t + 1, t + 1) if str(i) in tr_df.columns]
-    right = [
-        str(i) for i in range(t + 1 + g, t + delta_t + g + 1) if str(i) in tr_df.columns
-    ]
+    if isinstance(tr_df, TransitionIndex):
+        if tr_df.kind != "following":
+            raise ValueError("tr_df must be a following TransitionIndex")
+        return tr_df.networks(t, delta_t, g)
+
+    left, right = determine_window_months(tr_df.columns, t, delta_t, g)
 
     temp_left = tr_df[["i", "j"] + left]
     temp_right = tr_df[["i", "j"] + right]
@@ -128,19 +197,23 @@ def build_ocs_networks(df: pd.DataFrame) -> nx.DiGraph:
 
     g = nx.DiGraph()
 
-    for idx, row in df.iterrows():
-        for col in df.columns[2:]:
-            if not pd.isna(row[col]):
-                if g.has_edge(row["i"], row["j"]):
-                    g[row["i"]][row["j"]]["ocs_transition"].append(row[col])
-                else:
-                    g.add_edge(row["i"], row["j"], ocs_transition=[row[col]])
+    # One list of transitions per edge, in the order the edges are first found
+    edges = (
+        melt_transitions(df)
+        .groupby(["i", "j"], sort=False, dropna=False)["transition"]
+        .agg(list)
+    )
+
+    g.add_edges_from(
+        (i, j, transition_edge_attributes(transitions, "ocs"))
+        for (i, j), transitions in edges.items()
+    )
 
     return g
 
 
 def create_ocs_attribute_networks(
-    tr_df: pd.DataFrame,
+    tr_df: Union[pd.DataFrame, "TransitionIndex"],
     t: int,
     delta_t: int,
     g: int = 0,
@@ -148,7 +221,8 @@ def create_ocs_attribute_networks(
     """creates networks for Occ. Series
 
     Args:
-        tr_df (pd.DataFrame): transition dataframe
+        tr_df (Union[pd.DataFrame, TransitionIndex]): transition dataframe, or an
+            ocs TransitionIndex of it
         t (int): $t$
         delta_t (int): $\delta_t
         g (int, optional): gap parameter. Defaults to 0.
@@ -157,10 +231,12 @@ def create_ocs_attribute_networks(
         Union[nx.DiGraph, nx.DiGraph,list, list]
     """
 
-    left = [str(i) for i in range(t - delta_t + 1, t + 1) if str(i) in tr_df.columns]
-    right = [
-        str(i) for i in range(t + 1 + g, t + delta_t + g + 1) if str(i) in tr_df.columns
-    ]
+    if isinstance(tr_df, TransitionIndex):
+        if tr_df.kind != "ocs":
+            raise ValueError("tr_df must be a ocs TransitionIndex")
+        return tr_df.networks(t, delta_t, g)
+
+    left, right = determine_window_months(tr_df.columns, t, delta_t, g)
 
     temp_left = tr_df[["i", "j"] + left]
     temp_right = tr_df[["i", "j"] + right]
@@ -171,6 +247,393 @@ def create_ocs_attribute_networks(
     return left_g, right_g, left, right
 
 
+class TransitionIndex:
+    """Transitions of a transition dataframe stored once as integer coded arrays
+    per month. The networks of any window are built by concatenating the arrays
+    of its months instead of selecting and scanning the dataframe columns.
+    """
+
+    def __init__(self, tr_df: pd.DataFrame, kind: str = "following"):
+        """
+        Args:
+            tr_df (pd.DataFrame): a dataframe that contains the transitions between two locations
+            kind (str, optional): "following" or "ocs". Defaults to "following".
+        """
+        if kind == "following":
+            fields = ["person", "following"]
+        elif kind == "ocs":
+            fields = ["ocs"]
+        else:
+            raise ValueError("kind must be 'following' or 'ocs'")
+
+        self.columns = list(tr_df.columns)
+        self.kind = kind
+        self.fields = fields
+
+        transitions = melt_transitions(tr_df)
+
+        # nodes are coded together so i and j share codes
+        n_transitions = len(transitions)
+        node_codes, self.nodes = pd.factorize(
+            np.concatenate(
+                [
+                    transitions["i"].to_numpy(dtype=object),
+                    transitions["j"].to_numpy(dtype=object),
+                ]
+            )
+        )
+        columns = {
+            "row": transitions["row"].to_numpy(dtype=np.int64),
+            "i": node_codes[:n_transitions],
+            "j": node_codes[n_transitions:],
+        }
+
+        values = transitions["transition"].to_numpy()
+        if kind == "following":
+            field_values = {
+                "person": [transition[0] for transition in values],
+                "following": [transition[1] for transition in values],
+            }
+        else:
+            field_values = {"ocs": values}
+
+        self.values = {}
+        for field in fields:
+            codes, self.values[field] = pd.factorize(
+                pd.Series(field_values[field], dtype=object)
+            )
+            columns[field] = codes
+
+        # Transitions are melted in row order, so each month stays in row order
+        months = transitions["month"].to_numpy()
+        self.month_arrays = {}
+        for month in pd.unique(months):
+            in_month = months == month
+            self.month_arrays[month] = {
+                name: array[in_month] for name, array in columns.items()
+            }
+
+    def window_arrays(self, months: list) -> dict:
+        """Concatenates the arrays of months in row then month order
+
+        Args:
+            months (list): month columns
+
+        Returns:
+            dict: row, i, j and field code arrays
+        """
+        months = sorted(
+            [month for month in months if month in self.month_arrays], key=int
+        )
+        names = ["row", "i", "j"] + self.fields
+        if not months:
+            return {name: np.array([], dtype=np.int64) for name in names}
+
+        arrays = {
+            name: np.concatenate([self.month_arrays[month][name] for month in months])
+            for name in names
+        }
+        order = np.argsort(arrays["row"], kind="stable")
+
+        return {name: array[order] for name, array in arrays.items()}
+
+    def to_network(self, months: list) -> nx.DiGraph:
+        """Builds the network of months, the same as `build_following_networks`
+        or `build_ocs_networks` on those month columns
+
+        Args:
+            months (list): month columns
+
+        Returns:
+            nx.DiGraph: Directed graph with information
+        """
+        arrays = self.window_arrays(months)
+
+        g = nx.DiGraph()
+        if len(arrays["row"]) == 0:
+            return g
+
+        # Edges are numbered in the order they are first found
+        edge_codes, _ = pd.factorize(arrays["i"] * len(self.nodes) + arrays["j"])
+        order = np.argsort(edge_codes, kind="stable")
+        bounds = np.flatnonzero(np.diff(edge_codes[order])) + 1
+        starts = np.concatenate([[0], bounds])
+        stops = np.concatenate([bounds, [len(order)]])
+
+        i_nodes = self.nodes[arrays["i"][order][starts]].tolist()
+        j_nodes = self.nodes[arrays["j"][order][starts]].tolist()
+        field_lists = {}
+        for field in self.fields:
+            values = np.asarray(self.values[field], dtype=object)
+            values = values[arrays[field][order]].tolist()
+            field_lists[field] = [
+                values[start:stop] for start, stop in zip(starts, stops)
+            ]
+
+        if self.kind == "following":
+            attributes = (
+                {"people": people, "following": following}
+                for people, following in zip(
+                    field_lists["person"], field_lists["following"]
+                )
+            )
+        else:
+            attributes = ({"ocs_transition": ocs} for ocs in field_lists["ocs"])
+
+        g.add_edges_from(
+            (i, j, attribute)
+            for i, j, attribute in zip(i_nodes, j_nodes, attributes)
+        )
+
+        return g
+
+    def to_array_network(self, months: list) -> "ArrayDiGraph":
+        """Builds the network of months as an ArrayDiGraph, weighted by the
+        number of transitions of each edge
+
+        Args:
+            months (list): month columns
+
+        Returns:
+            ArrayDiGraph: weighted directed graph
+        """
+        arrays = self.window_arrays(months)
+
+        return ArrayDiGraph.from_edges(
+            self.nodes[arrays["i"]], self.nodes[arrays["j"]]
+        )
+
+    def array_networks(self, t: int, delta_t: int, g: int = 0) -> tuple:
+        """Builds the T_< and T_> networks as ArrayDiGraph
+
+        Args:
+            t (int): month t which will be the center of the interval of observed
+            months. in case of a gap, it will be the end of T<
+            delta_t (int): the width of the interval
+            g (int, optional): a gap between T< and T>. Defaults to 0.
+
+        Returns:
+            tuple: T_< and T_> networks and their month columns
+        """
+        left, right = determine_window_months(self.columns, t, delta_t, g)
+
+        return self.to_array_network(left), self.to_array_network(right), left, right
+
+    def networks(self, t: int, delta_t: int, g: int = 0) -> tuple:
+        """Builds the T_< and T_> networks
+
+        Args:
+            t (int): month t which will be the center of the interval of observed
+            months. in case of a gap, it will be the end of T<
+            delta_t (int): the width of the interval
+            g (int, optional): a gap between T< and T>. Defaults to 0.
+
+        Returns:
+            tuple: T_< and T_> networks and their month columns, the same as
+            `create_following_attribute_networks`
+        """
+        left, right = determine_window_months(self.columns, t, delta_t, g)
+
+        return self.to_network(left), self.to_network(right), left, right
+
+
+class ArrayEdgeView:
+    """Edges of an ArrayDiGraph as (i, j) tuples. Like the networkx edge view
+    it can be iterated, counted and called."""
+
+    def __init__(self, graph: "ArrayDiGraph"):
+        self.graph = graph
+
+    def __call__(self):
+        return self
+
+    def __iter__(self):
+        return zip(
+            self.graph.nodes[self.graph.src].tolist(),
+            self.graph.nodes[self.graph.dst].tolist(),
+        )
+
+    def __len__(self):
+        return len(self.graph.src)
+
+    def __contains__(self, edge):
+        return self.graph.has_edge(*edge)
+
+
+class ArrayDiGraph:
+    """Weighted directed graph stored as NumPy arrays. Nodes are coded by their
+    position in nodes, and edge k goes from nodes[src[k]] to nodes[dst[k]] with
+    weight[k]. It has the parts of the nx.DiGraph interface used by the rewires
+    and calculations, so they can use it in place of a nx.DiGraph.
+    """
+
+    def __init__(
+        self,
+        nodes: np.ndarray,
+        src: np.ndarray,
+        dst: np.ndarray,
+        weight: np.ndarray = None,
+    ):
+        """
+        Args:
+            nodes (np.ndarray): node of each code
+            src (np.ndarray): code of the node each edge starts at
+            dst (np.ndarray): code of the node each edge ends at
+            weight (np.ndarray, optional): weight of each edge. Defaults to None,
+            which gives every edge a weight of 1.
+        """
+        self.nodes = np.asarray(nodes, dtype=object)
+        self.src = np.asarray(src, dtype=np.int64)
+        self.dst = np.asarray(dst, dtype=np.int64)
+        if weight is None:
+            weight = np.ones(len(self.src), dtype=np.int64)
+        self.weight = np.asarray(weight)
+
+        self.node_codes = {node: code for code, node in enumerate(self.nodes.tolist())}
+        self.successor_index = None
+        self.predecessor_index = None
+
+    @classmethod
+    def from_edges(
+        cls, i: np.ndarray, j: np.ndarray, weight: np.ndarray = None
+    ) -> "ArrayDiGraph":
+        """Creates a graph from edges, adding the weights of repeated edges.
+        Nodes are in the order they are first found and edges are in the order
+        of their first node, the same as iterating the edges of a nx.DiGraph
+        the edges were added to one at a time.
+
+        Args:
+            i (np.ndarray): node each edge starts at
+            j (np.ndarray): node each edge ends at
+            weight (np.ndarray, optional): weight of each edge. Defaults to None,
+            which gives every edge a weight of 1.
+
+        Returns:
+            ArrayDiGraph: weighted directed graph
+        """
+        ends = np.empty(2 * len(i), dtype=object)
+        ends[0::2] = np.asarray(i, dtype=object)
+        ends[1::2] = np.asarray(j, dtype=object)
+        node_codes, nodes = pd.factorize(ends)
+        src = node_codes[0::2]
+        dst = node_codes[1::2]
+
+        edge_codes, _ = pd.factorize(src * len(nodes) + dst)
+        _, first = np.unique(edge_codes, return_index=True)
+        n_edges = len(first)
+
+        if weight is None:
+            weights = np.bincount(edge_codes, minlength=n_edges)
+        else:
+            weight = np.asarray(weight)
+            weights = np.bincount(edge_codes, weights=weight, minlength=n_edges)
+            weights = weights.astype(weight.dtype)
+
+        # networkx iterates edges by node, then in the order they were added
+        order = np.argsort(src[first], kind="stable")
+        first = first[order]
+
+        return cls(nodes, src[first], dst[first], weights[order])
+
+    @classmethod
+    def from_networkx(cls, G: nx.DiGraph, weight: str = "weight") -> "ArrayDiGraph":
+        """Creates a graph from a nx.DiGraph, keeping the node and edge order
+
+        Args:
+            G (nx.DiGraph): directed network
+            weight (str, optional): edge attribute with the weight, edges without
+            it have a weight of 1. Defaults to "weight".
+
+        Returns:
+            ArrayDiGraph: weighted directed graph
+        """
+        nodes = list(G.nodes)
+        node_codes = {node: code for code, node in enumerate(nodes)}
+        edges = list(G.edges(data=weight, default=1))
+
+        return cls(
+            nodes,
+            np.array([node_codes[i] for i, _, _ in edges], dtype=np.int64),
+            np.array([node_codes[j] for _, j, _ in edges], dtype=np.int64),
+            np.array([w for _, _, w in edges]),
+        )
+
+    def to_networkx(self, weight: str = "weight") -> nx.DiGraph:
+        """Converts the graph to a nx.DiGraph
+
+        Args:
+            weight (str, optional): edge attribute for the weight. Defaults to "weight".
+
+        Returns:
+            nx.DiGraph: directed network
+        """
+        g = nx.DiGraph()
+        g.add_nodes_from(self.nodes.tolist())
+        g.add_edges_from(
+            (i, j, {weight: w})
+            for (i, j), w in zip(self.edges, self.weight.tolist())
+        )
+
+        return g
+
+    @property
+    def edges(self) -> ArrayEdgeView:
+        return ArrayEdgeView(self)
+
+    def number_of_nodes(self) -> int:
+        return len(self.nodes)
+
+    def number_of_edges(self) -> int:
+        return len(self.src)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return self.has_node(node)
+
+    def has_node(self, node) -> bool:
+        return node in self.node_codes
+
+    def has_edge(self, i, j) -> bool:
+        return self.has_node(i) and j in self.successors(i)
+
+    def build_neighbor_index(self, out: bool) -> list:
+        """Builds the successors (out) or predecessors of every node from a CSR
+        index of the edges
+
+        Args:
+            out (bool): index successors instead of predecessors
+
+        Returns:
+            list: neighbors of each node code
+        """
+        start, end = (self.src, self.dst) if out else (self.dst, self.src)
+        order = np.argsort(start, kind="stable")
+        indptr = np.concatenate(
+            [[0], np.cumsum(np.bincount(start, minlength=len(self.nodes)))]
+        )
+        neighbors = self.nodes[end[order]].tolist()
+
+        return [
+            neighbors[indptr[code] : indptr[code + 1]]
+            for code in range(len(self.nodes))
+        ]
+
+    def successors(self, node) -> list:
+        if self.successor_index is None:
+            self.successor_index = self.build_neighbor_index(True)
+        return self.successor_index[self.node_codes[node]]
+
+    def predecessors(self, node) -> list:
+        if self.predecessor_index is None:
+            self.predecessor_index = self.build_neighbor_index(False)
+        return self.predecessor_index[self.node_codes[node]]
+
+    def degree(self, node) -> int:
+        return len(self.successors(node)) + len(self.predecessors(node))
+
+
 ## rewires
 
 
@@ -182,8 +645,9 @@ def preserve_strength(
 
     Parameters
     ----------
-    G : networkx DiGraph with weights
-        directed network produced with networkx
+    G : networkx DiGraph or ArrayDiGraph with weights
+        directed network produced with networkx, or an ArrayDiGraph which
+        is rewired with arrays and returns an ArrayDiGraph
     use_seed : int, optional
         calls numpy's random number generator seed (default is None)
     tol : int, optional
@@ -201,6 +665,11 @@ def preserve_strength(
         original network
     """
 
+    if isinstance(G, ArrayDiGraph):
+        return preserve_strength_arrays(
+            G, use_seed, tol, report_lost, with_self_loops
+        )
+
     theseed = np.random.default_rng(seed=use_seed)
     newG = nx.DiGraph()
     istubs = []
@@ -264,6 +733,70 @@ def preserve_strength(
         return newG
 
 
+def preserve_strength_arrays(
+    G: ArrayDiGraph,
+    use_seed=None,
+    tol: int = 30,
+    report_lost: bool = False,
+    with_self_loops: bool = False,
+) -> Union[dict, ArrayDiGraph]:
+    """`preserve_strength` for an ArrayDiGraph. The stubs are shuffled the same
+    way, so the same seed gives the same rewired network.
+
+    Args:
+        G (ArrayDiGraph): weighted directed network
+        use_seed (int, optional): calls numpy's random number generator seed. Defaults to None.
+        tol (int, optional): number of times to reattempt the rewiring. Defaults to 30.
+        report_lost (bool, optional): also report the lost links. Defaults to False.
+        with_self_loops (bool, optional): allow self loops. Defaults to False.
+
+    Returns:
+        Union[dict, ArrayDiGraph]: rewired network
+    """
+
+    theseed = np.random.default_rng(seed=use_seed)
+    weights = G.weight.astype(int)
+    istubs = np.repeat(G.src, weights)
+    jstubs = np.repeat(G.dst, weights)
+    theseed.shuffle(istubs)
+    theseed.shuffle(jstubs)
+
+    new_i = []
+    new_j = []
+
+    def pair_stubs(i_stubs, j_stubs):
+        if with_self_loops:
+            loops = np.zeros(len(i_stubs), dtype=bool)
+        else:
+            loops = i_stubs == j_stubs
+        new_i.append(i_stubs[~loops])
+        new_j.append(j_stubs[~loops])
+        return i_stubs[loops], j_stubs[loops]
+
+    unused_i, unused_j = pair_stubs(istubs, jstubs)
+    num_tries = 0
+    theseed.shuffle(unused_i)
+    theseed.shuffle(unused_j)
+    while (len(unused_i) > 0) and (num_tries < tol):
+        unused_i, unused_j = pair_stubs(unused_i, unused_j)
+        num_tries += 1
+        if len(unused_i) > 0:
+            theseed.shuffle(unused_i)
+            theseed.shuffle(unused_j)
+
+    newG = ArrayDiGraph.from_edges(
+        G.nodes[np.concatenate(new_i)], G.nodes[np.concatenate(new_j)]
+    )
+    if report_lost:
+        return {
+            "net": newG,
+            "lost": len(unused_i),
+            "missing_per": len(unused_i) / G.number_of_edges(),
+        }
+    else:
+        return newG
+
+
 def preserve_strength_and_following(
     G,
     possible_destinations: dict,
@@ -1,74 +1,441 @@
+import hashlib
+import os
+import pickle
+import numpy as np
 import pandas as pd
 import uuid
 import math
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from typing import Union
 
+from utils.helpers import find_team_uids_by_month
 
-def build_team_dict(df: pd.DataFrame) -> dict:
+
+def build_team_dict(
+    df: pd.DataFrame,
+    grouped: bool = False,
+    hash_mode: str = "python",
+    id_prefix: str = None,
+) -> dict:
     """Provide a data frame of data for a given month of data
     and get back dict of the teams found in that month
 
     Args:
         df (pd.DataFrame): One month of data in a pd.DataFrame
+        grouped (bool, optional): build every team in a single groupby pass
+            using `build_grouped_team_dict`. Defaults to False.
+        hash_mode (str, optional): "python" or "stable", see `create_team`.
+            Defaults to "python".
+        id_prefix (str, optional): prefix for deterministic team uids, see
+            `TeamIdAllocator`. Defaults to None, which uses random uids.
 
     Returns:
         dict: dict of teams found that month
     """
+    if grouped:
+        return build_grouped_team_dict(df, hash_mode=hash_mode, id_prefix=id_prefix)
+
     # creates a list of unique supervisors
     supervisor_keys = build_supervisor_list(df)
 
     team_dict = {}
+    id_allocator = TeamIdAllocator(id_prefix)
 
     for i in supervisor_keys:
-        uid = str(uuid.uuid4()).replace("-", "")[:10]
-        while uid in team_dict:
-            uid = str(uuid.uuid4()).replace("-", "")[:10]
-
         # Determine if a team is terminal
         team_members = determine_terminal_teams(df, i, supervisor_keys)
 
         if team_members:
-            # Start the team
-            team_dict[uid] = {}
-
-            # Add supervisor
-            team_dict[uid]["supervisor"] = i
-
-            # Add team members
-
-            team_dict[uid]["team_members"] = team_members
-
             # Get list of UICs for team members in the event they are different
 
             temp_uic = list(set(df[df["MASTERKEY"].isin(team_members)]["UIC"]))
             # Sort uics and remove NaN
             temp_uic = sorted([x for x in temp_uic if not isinstance(x, float)])
-            team_dict[uid]["uic"] = temp_uic
             # Determine if the supervisor UIC is different
             try:
                 supervisor_uic = df[df["MASTERKEY"] == i].iloc[0]["UIC"]
-                if supervisor_uic not in team_dict[uid]["uic"]:
+                if supervisor_uic not in temp_uic:
                     if not isinstance(supervisor_uic, float):
-                        team_dict[uid]["uic"].append(supervisor_uic)
+                        temp_uic.append(supervisor_uic)
 
             except:
                 pass
 
-            # Add team size and include supervisor
-            team_dict[uid]["team_size"] = len(team_dict[uid]["team_members"]) + 1
+            uid = id_allocator.new_id()
+            team_dict[uid] = create_team(i, team_members, temp_uic, hash_mode)
 
-            # Make a unique hash
-            team_dict[uid]["hash"] = hash(
-                (
-                    team_dict[uid]["supervisor"],
-                    str(team_dict[uid]["team_members"]),
-                    str(team_dict[uid]["uic"]),
-                )
+    return team_dict
+
+
+def build_grouped_team_dict(
+    df: pd.DataFrame, hash_mode: str = "python", id_prefix: str = None
+) -> dict:
+    """Builds the same dict of teams as `build_team_dict`, but finds every
+    terminal team at once with `determine_terminal_team_table` and builds the
+    teams in one groupby pass instead of filtering the month once per
+    supervisor. The UICs are looked up from a single MASTERKEY index built
+    with `build_uic_index`.
+
+    Args:
+        df (pd.DataFrame): One month of data in a pd.DataFrame
+        hash_mode (str, optional): "python" or "stable", see `create_team`.
+            Defaults to "python".
+        id_prefix (str, optional): prefix for deterministic team uids, see
+            `TeamIdAllocator`. Defaults to None, which uses random uids.
+
+    Returns:
+        dict: dict of teams found that month
+    """
+    terminal_teams = determine_terminal_team_table(df)
+    uic_index = build_uic_index(df)
+
+    # build_team_dict reads the supervisor's UIC from a row of df, which
+    # converts a numeric UIC to a NumPy scalar of the row's dtype, e.g. it
+    # becomes a float when SUPERVISOR MASTERKEY has NaN and is then dropped
+    uic_type = type(df.iloc[0]["UIC"]) if len(df) else None
+    if uic_type is not None and not issubclass(uic_type, np.generic):
+        uic_type = None
+
+    team_dict = {}
+    id_allocator = TeamIdAllocator(id_prefix)
+
+    for i, members in terminal_teams.groupby("SUPERVISOR MASTERKEY", sort=False)[
+        "MASTERKEY"
+    ]:
+        team_members = members.to_list()
+
+        # Sort uics and remove NaN
+        temp_uic = set()
+        for tm in set(team_members):
+            temp_uic.update(uic_index.get(tm, []))
+        temp_uic = sorted([x for x in temp_uic if not isinstance(x, float)])
+
+        # Determine if the supervisor UIC is different
+        if i in uic_index:
+            supervisor_uic = uic_index[i][0]
+            if uic_type is not None:
+                supervisor_uic = uic_type(supervisor_uic)
+            if supervisor_uic not in temp_uic:
+                if not isinstance(supervisor_uic, float):
+                    temp_uic.append(supervisor_uic)
+
+        uid = id_allocator.new_id()
+        team_dict[uid] = create_team(i, team_members, temp_uic, hash_mode)
+
+    return team_dict
+
+
+def build_uic_index(df: pd.DataFrame) -> dict:
+    """Creates a lookup of the UICs found for each MASTERKEY in a month.
+    UICs are kept in row order, so the first UIC is the one found by
+    `df[df["MASTERKEY"] == key].iloc[0]`.
+
+    Args:
+        df (pd.DataFrame): One month of data
+
+    Returns:
+        dict: MASTERKEY: list of UICs
+    """
+    uic_index = {}
+    for key, uic in zip(df["MASTERKEY"].to_list(), df["UIC"].to_list()):
+        if key in uic_index:
+            uic_index[key].append(uic)
+        else:
+            uic_index[key] = [uic]
+    return uic_index
+
+
+def create_team(
+    supervisor: Union[int, float, str],
+    team_members: list,
+    uic: list,
+    hash_mode: str = "python",
+) -> dict:
+    """Creates the entry for a single team in a team dict
+
+    Args:
+        supervisor (Union[int, float, str]): The supervisor of the team
+        team_members (list): list of team members' MASTERKEY
+        uic (list): list of UICs for the team
+        hash_mode (str, optional): "python" uses python's hash, which is salted
+            per process. "stable" uses `stable_team_hash`, which is the same in
+            every process. Defaults to "python".
+
+    Returns:
+        dict: the team
+    """
+    team = {
+        "supervisor": supervisor,
+        "team_members": team_members,
+        "uic": uic,
+        # Add team size and include supervisor
+        "team_size": len(team_members) + 1,
+    }
+
+    # Make a unique hash
+    if hash_mode == "stable":
+        team["hash"] = stable_team_hash(supervisor, team_members, uic)
+    elif hash_mode == "python":
+        team["hash"] = hash(
+            (
+                team["supervisor"],
+                str(team["team_members"]),
+                str(team["uic"]),
             )
+        )
+    else:
+        raise ValueError("hash_mode must be 'python' or 'stable'")
+    return team
+
+
+def stable_team_hash(
+    supervisor: Union[int, float, str], team_members: list, uic: list
+) -> int:
+    """Creates a 64-bit hash of a team that is the same in every process, so
+    it can be stored and compared between runs. Team members are sorted and
+    numeric keys are hashed as float64, so the hash does not depend on the
+    order of the rows or on a key being read as an int or a float.
+
+    Args:
+        supervisor (Union[int, float, str]): The supervisor of the team
+        team_members (list): list of team members' MASTERKEY
+        uic (list): list of UICs for the team
+
+    Returns:
+        int: signed 64-bit hash
+    """
+    digest = hashlib.blake2b(digest_size=8)
+
+    members = np.asarray(team_members)
+    if members.dtype.kind in "iuf":
+        digest.update(np.float64(supervisor).tobytes())
+        digest.update(np.sort(members.astype(np.float64)).tobytes())
+    else:
+        digest.update(repr(str(supervisor)).encode())
+        digest.update(repr(sorted(str(tm) for tm in team_members)).encode())
+    digest.update(repr([str(u) for u in uic]).encode())
+
+    return int.from_bytes(digest.digest(), "little", signed=True)
+
+
+class CompactTeam:
+    """Memory efficient version of a team in a team dict. Team members and
+    the supervisor are stored as integer codes (see `build_key_codes`) and
+    the team members are kept as an int32 array in their original order.
+    Values can be read like a team dict, e.g. team["team_members"].
+    """
+
+    __slots__ = ("supervisor", "team_members", "uic", "team_size", "hash")
+
+    def __init__(
+        self,
+        supervisor: int,
+        team_members: np.ndarray,
+        uic: tuple,
+        team_size: int,
+        hash: int,
+    ):
+        self.supervisor = supervisor
+        self.team_members = team_members
+        self.uic = uic
+        self.team_size = team_size
+        self.hash = hash
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def to_dict(self, key_codes: np.ndarray) -> dict:
+        """Converts the team back to a team dict using the original MASTERKEYs
+
+        Args:
+            key_codes (np.ndarray): keys used to encode the team
+
+        Returns:
+            dict: the team
+        """
+        return {
+            "supervisor": key_codes[self.supervisor].item(),
+            "team_members": key_codes[self.team_members].tolist(),
+            "uic": list(self.uic),
+            "team_size": self.team_size,
+            "hash": self.hash,
+        }
+
+
+def build_key_codes(df_dict: dict) -> np.ndarray:
+    """Creates the sorted array of every MASTERKEY and SUPERVISOR MASTERKEY
+    found in the data. The position of a key in the array is its code.
+
+    Args:
+        df_dict (dict): month: pd.DataFrame
+
+    Returns:
+        np.ndarray: sorted unique keys with NaN removed
+    """
+    keys = []
+    for df in df_dict.values():
+        keys.append(df["MASTERKEY"].dropna().unique())
+        keys.append(df["SUPERVISOR MASTERKEY"].dropna().unique())
+    return np.unique(np.concatenate(keys))
+
+
+def extend_key_codes(key_codes: np.ndarray, df: pd.DataFrame) -> np.ndarray:
+    """Adds the keys of a new month that do not have a code yet to the end of
+    the key codes, so the codes of the keys already coded do not change
+
+    Args:
+        key_codes (np.ndarray): keys created by `build_key_codes`, or None
+        df (pd.DataFrame): One month of data
+
+    Returns:
+        np.ndarray: key codes with the new keys at the end
+    """
+    new_keys = build_key_codes({"month": df})
+    if key_codes is None:
+        return new_keys
+    new_keys = new_keys[~np.isin(new_keys, key_codes)]
+    return np.concatenate([key_codes, new_keys])
+
+
+def encode_keys(keys, key_codes: np.ndarray) -> np.ndarray:
+    """Converts MASTERKEYs to their integer codes. Key codes extended with
+    `extend_key_codes` are no longer sorted, so they are searched in sorted
+    order.
 
+    Args:
+        keys: MASTERKEYs to convert
+        key_codes (np.ndarray): keys created by `build_key_codes`
+
+    Returns:
+        np.ndarray: int32 codes
+    """
+    sorter = np.argsort(key_codes, kind="stable")
+    return sorter[np.searchsorted(key_codes, keys, sorter=sorter)].astype(np.int32)
+
+
+def build_compact_team_dict(
+    df: pd.DataFrame,
+    key_codes: np.ndarray,
+    hash_mode: str = "python",
+    id_prefix: str = None,
+) -> dict:
+    """Builds the teams for a month using `build_grouped_team_dict` and
+    stores them as `CompactTeam`
+
+    Args:
+        df (pd.DataFrame): One month of data in a pd.DataFrame
+        key_codes (np.ndarray): keys created by `build_key_codes`
+        hash_mode (str, optional): "python" or "stable", see `create_team`.
+            Defaults to "python".
+        id_prefix (str, optional): prefix for deterministic team uids. Defaults to None.
+
+    Returns:
+        dict: dict of teams found that month
+    """
+    team_dict = build_grouped_team_dict(df, hash_mode=hash_mode, id_prefix=id_prefix)
+    return encode_team_dict(team_dict, key_codes)
+
+
+def encode_team_dict(team_dict: dict, key_codes: np.ndarray) -> dict:
+    """Converts the teams of a team dict to `CompactTeam`
+
+    Args:
+        team_dict (dict): dict of teams using MASTERKEYs
+        key_codes (np.ndarray): keys created by `build_key_codes`
+
+    Returns:
+        dict: dict of compact teams
+    """
+    # Encode every key of the month at once
+    teams = list(team_dict.values())
+    sizes = [len(team["team_members"]) for team in teams]
+    keys = [team["supervisor"] for team in teams]
+    for team in teams:
+        keys.extend(team["team_members"])
+    codes = encode_keys(keys, key_codes) if keys else np.array([], dtype=np.int32)
+
+    supervisors = codes[: len(teams)].tolist()
+    team_members = np.split(codes[len(teams) :], np.cumsum(sizes)[:-1])
+    for uid, team, supervisor, members in zip(
+        list(team_dict), teams, supervisors, team_members
+    ):
+        team_dict[uid] = CompactTeam(
+            supervisor,
+            members,
+            tuple(team["uic"]),
+            team["team_size"],
+            team["hash"],
+        )
     return team_dict
 
 
+def member_list(team_members: Union[list, np.ndarray]) -> list:
+    """Returns team members as a list of python values
+
+    Args:
+        team_members (Union[list, np.ndarray]): team members of a team or a compact team
+
+    Returns:
+        list: team members
+    """
+    if isinstance(team_members, np.ndarray):
+        return team_members.tolist()
+    return team_members
+
+
+def same_members(
+    team_members: Union[list, np.ndarray], other: Union[list, np.ndarray]
+) -> bool:
+    """Checks if two teams have the same team members in the same order
+
+    Args:
+        team_members (Union[list, np.ndarray]): team members
+        other (Union[list, np.ndarray]): other team members
+
+    Returns:
+        bool: True if the team members are the same
+    """
+    if isinstance(team_members, np.ndarray) or isinstance(other, np.ndarray):
+        return np.array_equal(team_members, other)
+    return team_members == other
+
+
+class TeamIdAllocator:
+    """Creates unique team uids. Without a prefix uids are the first 10
+    characters of a uuid4. With a prefix uids are the prefix and a counter,
+    e.g. "20120131-000000", so the same data always gets the same uids.
+    """
+
+    def __init__(self, prefix: str = None):
+        self.prefix = prefix
+        self.count = 0
+        self.used = set()
+
+    def new_id(self, taken=None) -> str:
+        """Returns a uid that has not been returned before
+
+        Args:
+            taken (optional): other uids that can not be used. Defaults to None.
+
+        Returns:
+            str: new uid
+        """
+        uid = self.next_candidate()
+        while uid in self.used or (taken is not None and uid in taken):
+            uid = self.next_candidate()
+        self.used.add(uid)
+        return uid
+
+    def next_candidate(self) -> str:
+        if self.prefix is None:
+            return str(uuid.uuid4()).replace("-", "")[:10]
+        uid = "{}-{:06d}".format(self.prefix, self.count)
+        self.count += 1
+        return uid
+
+
 def build_supervisor_list(df: pd.DataFrame) -> list:
     """Generates a list of supervisors for a dataframe
 
@@ -114,6 +481,44 @@ def determine_terminal_teams(
     return team_members
 
 
+def determine_terminal_team_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Finds the team members of every terminal team in a month at once. A
+    team is terminal if none of its team members is also a supervisor. As in
+    `determine_terminal_teams`, supervisors supervising themselves are not
+    team members.
+
+    Args:
+        df (pd.DataFrame): data for a given month
+
+    Returns:
+        pd.DataFrame: SUPERVISOR MASTERKEY and MASTERKEY of the team members of
+        terminal teams. Teams are in the order the supervisors first appear in
+        the month and team members are in row order.
+    """
+    supervisors = df["SUPERVISOR MASTERKEY"]
+    # Position of each supervisor in the order they first appear
+    order, _ = pd.factorize(supervisors)
+
+    table = pd.DataFrame(
+        {
+            "SUPERVISOR MASTERKEY": supervisors,
+            "MASTERKEY": df["MASTERKEY"],
+            "order": order,
+        }
+    )
+    table = table[supervisors.notna() & (table["MASTERKEY"] != supervisors)]
+
+    # Remove teams where any team member is a supervisor
+    is_supervisor = table["MASTERKEY"].isin(supervisors.dropna().unique())
+    non_terminal = is_supervisor.groupby(table["SUPERVISOR MASTERKEY"]).transform(
+        "any"
+    )
+    table = table[~non_terminal]
+
+    table = table.sort_values("order", kind="stable")
+    return table[["SUPERVISOR MASTERKEY", "MASTERKEY"]].reset_index(drop=True)
+
+
 def create_linked_team(team_dict: dict, month: str, uid: str) -> dict:
     """Generates a new entry required for linking teams. The body initially
     created is then updated as months are looped through. This function is used
@@ -156,24 +561,371 @@ def update_team(lt: dict, td: dict) -> dict:
     return lt
 
 
+def build_linked_team_index(linked_teams: dict, live_teams: list) -> tuple:
+    """Creates inverted indexes from the last team members, last hash and last
+    supervisor of the live linked teams to the uids of those linked teams.
+    These are used to find the linked teams a new team can be matched to
+    without checking every linked team.
+
+    Args:
+        linked_teams (dict): The linked teams
+        live_teams (list): uids of the linked teams matched the previous month
+
+    Returns:
+        tuple: member index, hash index and supervisor index
+    """
+    member_index = {}
+    hash_index = {}
+    supervisor_index = {}
+
+    for k in live_teams:
+        lt = linked_teams[k]
+        for member in member_list(lt["last_team_members"]):
+            member_index.setdefault(member, []).append(k)
+        hash_index.setdefault(lt["last_hash"], []).append(k)
+        supervisor_index.setdefault(lt["last_supervisor"], []).append(k)
+
+    return member_index, hash_index, supervisor_index
+
+
+def build_month_team_dict(
+    df: pd.DataFrame,
+    grouped: bool = False,
+    hash_mode: str = "python",
+    key_codes: np.ndarray = None,
+    id_prefix: str = None,
+) -> dict:
+    """Builds the team dict for one month the way `LinkedTeams` is set up.
+    Compact teams are built when key codes are provided.
+
+    Args:
+        df (pd.DataFrame): One month of data in a pd.DataFrame
+        grouped (bool, optional): use `build_grouped_team_dict`. Defaults to False.
+        hash_mode (str, optional): "python" or "stable". Defaults to "python".
+        key_codes (np.ndarray, optional): keys created by `build_key_codes`. Defaults to None.
+        id_prefix (str, optional): prefix for deterministic team uids. Defaults to None.
+
+    Returns:
+        dict: dict of teams found that month
+    """
+    if key_codes is not None:
+        return build_compact_team_dict(df, key_codes, hash_mode, id_prefix)
+    return build_team_dict(
+        df, grouped=grouped, hash_mode=hash_mode, id_prefix=id_prefix
+    )
+
+
+def month_fingerprint(df: pd.DataFrame, options: tuple = ()) -> str:
+    """Creates a fingerprint of the MASTERKEY, SUPERVISOR MASTERKEY and UIC
+    columns of a month and of the options used to build its teams
+
+    Args:
+        df (pd.DataFrame): One month of data
+        options (tuple, optional): options used to build the teams. Defaults to ().
+
+    Returns:
+        str: hex fingerprint
+    """
+    columns = ["MASTERKEY", "SUPERVISOR MASTERKEY", "UIC"]
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(
+        pd.util.hash_pandas_object(df[columns], index=False).to_numpy().tobytes()
+    )
+    digest.update(repr([str(df[col].dtype) for col in columns]).encode())
+    digest.update(repr(options).encode())
+    return digest.hexdigest()
+
+
+def build_supervisor_index(df: pd.DataFrame, key_codes: np.ndarray = None) -> tuple:
+    """Creates a lookup of the supervisors of each MASTERKEY and of the
+    subordinates of each supervisor for a month. Rows without a supervisor
+    are left out of both.
+
+    Args:
+        df (pd.DataFrame): One month of data
+        key_codes (np.ndarray, optional): keys created by `build_key_codes`,
+            if provided the index uses key codes. Defaults to None.
+
+    Returns:
+        tuple: MASTERKEY: list of supervisors (one per row) and
+        supervisor: set of subordinates
+    """
+    supervisors_by_key = {}
+    subordinates_by_supervisor = {}
+
+    df = df[df["SUPERVISOR MASTERKEY"].notna()]
+    keys = df["MASTERKEY"].to_list()
+    supervisors = df["SUPERVISOR MASTERKEY"].to_list()
+    if key_codes is not None:
+        keys = encode_keys(keys, key_codes).tolist()
+        supervisors = encode_keys(supervisors, key_codes).tolist()
+
+    for key, supervisor in zip(keys, supervisors):
+        supervisors_by_key.setdefault(key, []).append(supervisor)
+        subordinates_by_supervisor.setdefault(supervisor, set()).add(key)
+
+    return supervisors_by_key, subordinates_by_supervisor
+
+
+def build_overlap_matrix(prior_teams: list, new_teams: list):
+    """Counts the team members shared by every pair of prior and new teams
+    with one sparse matrix product of their team membership matrices.
+
+    Args:
+        prior_teams (list): sets of team members of the prior teams
+        new_teams (list): sets of team members of the new teams
+
+    Returns:
+        scipy.sparse.csc_matrix: prior teams x new teams overlap counts, only
+        pairs sharing a team member are stored
+    """
+    try:
+        from scipy import sparse
+    except ImportError as e:
+        raise ImportError("sparse linking requires scipy") from e
+
+    people = {}
+
+    def membership(teams: list):
+        rows = []
+        cols = []
+        for row, team in enumerate(teams):
+            for person in team:
+                rows.append(row)
+                cols.append(people.setdefault(person, len(people)))
+        return rows, cols
+
+    prior_rows, prior_cols = membership(prior_teams)
+    new_rows, new_cols = membership(new_teams)
+
+    prior_matrix = sparse.csr_matrix(
+        (np.ones(len(prior_rows), dtype=np.int32), (prior_rows, prior_cols)),
+        shape=(len(prior_teams), len(people)),
+    )
+    new_matrix = sparse.csr_matrix(
+        (np.ones(len(new_rows), dtype=np.int32), (new_rows, new_cols)),
+        shape=(len(new_teams), len(people)),
+    )
+
+    return (prior_matrix @ new_matrix.T).tocsc()
+
+
 class LinkedTeams:
-    def __init__(self, df_dict, month_list):
+    def __init__(
+        self,
+        df_dict,
+        month_list,
+        coordinated_cache_size: int = 100000,
+        compact: bool = False,
+        hash_mode: str = "python",
+        deterministic_ids: bool = False,
+        cache_dir: str = None,
+        linking: str = "index",
+    ):
+        if cache_dir is not None and hash_mode != "stable":
+            raise ValueError("cache_dir requires hash_mode='stable'")
+        if linking not in ["index", "sparse"]:
+            raise ValueError("linking must be 'index' or 'sparse'")
+
         self.df_dict = df_dict
         self.month_list = month_list
+        # Directory used to cache the team dicts of each month
+        self.cache_dir = cache_dir
+        # How link candidates are found, "index" uses inverted indexes of the
+        # live teams, "sparse" uses overlap counts from `build_overlap_matrix`
+        self.linking = linking
+        # "python" or "stable" hashes for the teams, see create_team
+        self.hash_mode = hash_mode
+        # Use month prefixed counters as team uids instead of random uids
+        self.deterministic_ids = deterministic_ids
+        # Store teams as CompactTeam using integer codes for the MASTERKEYs
+        self.compact = compact
+        self.key_codes = None
         self.lineage_dict_departure = {}
         self.lineage_dict_arrival = {}
         self.team_dicts_by_month = {}
+        self.linked_teams = {}
+        self.active_teams = {}
+        self.retired_teams = {}
+        self.new_teams_by_month = {}
+        self.possible_teams = {}
+        # Optimal matches that were already taken, see resolve_optimal_matches
+        self.match_conflicts = {}
+        # The last month that has been linked
+        self.last_linked_month = None
+        self.supervisor_indexes = {}
+        # Least recently used cache of determine_coordinated verdicts
+        self.coordinated_cache_size = coordinated_cache_size
+        self.coordinated_cache = OrderedDict()
+        self.coordinated_cache_hits = 0
+        self.coordinated_cache_misses = 0
+
+    def create_team_dicts(self, grouped: bool = False, workers: int = None):
+        """Builds the team dict for every month in df_dict
 
-    def create_team_dicts(self):
-        for month, df in self.df_dict.items():
-            print("building month - {}".format(month))
-            self.team_dicts_by_month[month] = build_team_dict(df)
+        Args:
+            grouped (bool, optional): use `build_grouped_team_dict`. Defaults to False.
+            workers (int, optional): number of processes used to build the months.
+                Months are independent, so they are built in a process pool and
+                stored in the order of df_dict. Requires hash_mode="stable" as
+                python hashes differ between processes. Defaults to None, which
+                builds the months in this process.
+        """
+        if self.compact:
+            self.key_codes = build_key_codes(self.df_dict)
+
+        months = list(self.df_dict)
+
+        # Load the months that are in the cache directory
+        for month in months:
+            team_dict = self.load_cached_team_dict(month, grouped)
+            if team_dict is not None:
+                print("loading month - {}".format(month))
+                self.team_dicts_by_month[month] = team_dict
+
+        build_months = [
+            month for month in months if month not in self.team_dicts_by_month
+        ]
+
+        if workers is not None and workers > 1:
+            if self.hash_mode != "stable":
+                raise ValueError("workers > 1 requires hash_mode='stable'")
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                team_dicts = executor.map(
+                    build_month_team_dict,
+                    [self.df_dict[month] for month in build_months],
+                    repeat(grouped),
+                    repeat(self.hash_mode),
+                    repeat(self.key_codes),
+                    [self.id_prefix(month) for month in build_months],
+                )
+                for month, team_dict in zip(build_months, team_dicts):
+                    print("building month - {}".format(month))
+                    self.team_dicts_by_month[month] = team_dict
+                    self.save_cached_team_dict(month, grouped)
+        else:
+            for month in build_months:
+                print("building month - {}".format(month))
+                self.team_dicts_by_month[month] = build_month_team_dict(
+                    self.df_dict[month],
+                    grouped,
+                    self.hash_mode,
+                    self.key_codes,
+                    self.id_prefix(month),
+                )
+                self.save_cached_team_dict(month, grouped)
+
+        # Keep the months in the order of df_dict
+        self.team_dicts_by_month = {
+            month: self.team_dicts_by_month[month] for month in months
+        }
+
+    def cache_path(self, month: str, grouped: bool = False) -> str:
+        """Returns the file used to cache the team dict of a month. The file
+        name contains a fingerprint of the month's data and of the options
+        used to build the teams, so changed data is never loaded. Compact
+        teams are cached with MASTERKEYs, so the file does not depend on the
+        key codes of the other months.
+
+        Args:
+            month (str): The month of interest
+            grouped (bool, optional): use `build_grouped_team_dict`. Defaults to False.
+
+        Returns:
+            str: path to the cache file
+        """
+        fingerprint = month_fingerprint(
+            self.df_dict[month],
+            (grouped, self.hash_mode, self.compact, self.id_prefix(month)),
+        )
+        return os.path.join(
+            self.cache_dir, "teams-{}-{}.pkl".format(month, fingerprint)
+        )
+
+    def load_cached_team_dict(
+        self, month: str, grouped: bool = False
+    ) -> Union[dict, None]:
+        """Loads the team dict of a month from the cache directory
+
+        Args:
+            month (str): The month of interest
+            grouped (bool, optional): use `build_grouped_team_dict`. Defaults to False.
+
+        Returns:
+            Union[dict, None]: team dict or None if it is not cached
+        """
+        if self.cache_dir is None:
+            return None
+        path = self.cache_path(month, grouped)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            team_dict = pickle.load(f)
+        if self.compact:
+            team_dict = encode_team_dict(team_dict, self.key_codes)
+        return team_dict
+
+    def save_cached_team_dict(self, month: str, grouped: bool = False):
+        """Saves the team dict of a month to the cache directory
+
+        Args:
+            month (str): The month of interest
+            grouped (bool, optional): use `build_grouped_team_dict`. Defaults to False.
+        """
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.cache_path(month, grouped)
+        # Write to a temporary file first so an interrupted run never leaves
+        # a partial file behind
+        team_dict = self.team_dicts_by_month[month]
+        if self.compact:
+            team_dict = {
+                uid: team.to_dict(self.key_codes) for uid, team in team_dict.items()
+            }
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(team_dict, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    def id_prefix(self, month: str) -> Union[str, None]:
+        """Returns the prefix used for team uids of a month, None when team
+        uids are random
+
+        Args:
+            month (str): The month of interest
+
+        Returns:
+            Union[str, None]: the month or None
+        """
+        if self.deterministic_ids:
+            return str(month)
+        return None
+
+    def get_supervisor_index(self, month: str) -> tuple:
+        """Returns the supervisor index for a month, see `build_supervisor_index`.
+        The index is built the first time a month is requested and cached.
+
+        Args:
+            month (str): The month of interest
+
+        Returns:
+            tuple: MASTERKEY: list of supervisors and supervisor: set of subordinates
+        """
+        if month not in self.supervisor_indexes:
+            self.supervisor_indexes[month] = build_supervisor_index(
+                self.df_dict[month], self.key_codes
+            )
+        return self.supervisor_indexes[month]
 
     def determine_coordinated(
         self, people: list, month: str, departure: bool = True
     ) -> bool:
         """This is designed to see if there is a coordinated move. Your provide the function the team members that departed the team and the month they departed. We then look to see who their supervisors are the following month. If there is a supervisor match between the group, we return True - that it is a coordinated move, if not we return False - that it is not a coordinated move.
 
+        Verdicts are cached by (people, month, departure) in coordinated_cache, which keeps at most
+        coordinated_cache_size verdicts. coordinated_cache_hits and coordinated_cache_misses count the lookups.
+
         Args:
             group (list): List of team members that departed
             month (str): month the team members departed
@@ -183,36 +935,52 @@ class LinkedTeams:
             bool: True if it is coordinated, False if it is not coordinated
         """
 
-        supe_list = {True: self.new_supes, False: self.last_supes}
+        cache_key = (frozenset(people), month, departure)
+        if cache_key in self.coordinated_cache:
+            self.coordinated_cache_hits += 1
+            self.coordinated_cache.move_to_end(cache_key)
+            return self.coordinated_cache[cache_key]
+        self.coordinated_cache_misses += 1
 
         if not departure:
             month_index = self.month_list.index(month)
             month = self.month_list[month_index - 1]
 
+        supervisors_by_key, subordinates_by_supervisor = self.get_supervisor_index(
+            month
+        )
+        people = set(people)
+
         # Used to check for coordinated arrivals with a supervisor and
         # their subordinate
-        supe_arrivals = set(people).intersection(supe_list[departure])
-        if len(supe_arrivals) > 0:
-            for supe in supe_arrivals:
-                subordinates = set(
-                    self.df_dict[month][
-                        self.df_dict[month]["SUPERVISOR MASTERKEY"] == supe
-                    ]["MASTERKEY"].to_list()
-                )
-
-                if len(subordinates.intersection(set(people))) > 0:
-                    return True
-
-        supervisor_list = self.df_dict[month][
-            self.df_dict[month]["MASTERKEY"].isin(people)
-        ]["SUPERVISOR MASTERKEY"].to_list()
-
-        coordinated = len(supervisor_list) != len(set(supervisor_list))
+        coordinated = False
+        supe_arrivals = people.intersection(subordinates_by_supervisor)
+        for supe in supe_arrivals:
+            if len(subordinates_by_supervisor[supe].intersection(people)) > 0:
+                coordinated = True
+                break
+
+        if not coordinated:
+            supervisor_list = []
+            for person in people:
+                supervisor_list.extend(supervisors_by_key.get(person, []))
+
+            coordinated = len(supervisor_list) != len(set(supervisor_list))
+
+        # Remember the verdict, dropping the least recently used one when full
+        if self.coordinated_cache_size > 0:
+            self.coordinated_cache[cache_key] = coordinated
+            if len(self.coordinated_cache) > self.coordinated_cache_size:
+                self.coordinated_cache.popitem(last=False)
 
         return coordinated
 
     def find_optimal_match(
-        self, prior: str, possible_teams: list[str], month: str
+        self,
+        prior: str,
+        possible_teams: list[str],
+        month: str,
+        overlap_sizes: dict = None,
     ) -> Union[str, None]:
         """At times there is a need to find a match for a team that has changed based on a supervisor change
 
@@ -220,17 +988,29 @@ class LinkedTeams:
             prior (str): team dictionary
             possible_teams (list[str]): Other teams
             month (str): current month
+            overlap_sizes (dict, optional): (prior, team): number of shared team members,
+                used instead of comparing the team members. Defaults to None.
 
         Returns:
             Union[str, None]: matched team or None (None is no longer used)
         """
-        prior_team = set(self.linked_teams[prior]["last_team_members"])
         prior_supervisor = self.linked_teams[prior]["last_supervisor"]
         possible_size_matches = {}
 
-        for team in possible_teams:
-            possible_team = set(self.team_dicts_by_month[month][team]["team_members"])
-            possible_size_matches[team] = len(prior_team.intersection(possible_team))
+        if overlap_sizes is not None:
+            for team in possible_teams:
+                possible_size_matches[team] = overlap_sizes[(prior, team)]
+        else:
+            prior_team = set(
+                member_list(self.linked_teams[prior]["last_team_members"])
+            )
+            for team in possible_teams:
+                possible_team = set(
+                    member_list(self.team_dicts_by_month[month][team]["team_members"])
+                )
+                possible_size_matches[team] = len(
+                    prior_team.intersection(possible_team)
+                )
 
         possible_matches = [
             key for key, value in possible_size_matches.items() if value > 1
@@ -247,85 +1027,574 @@ class LinkedTeams:
                     return team
         return None
 
-    def build_linked_team_dict(self) -> dict:
+    def resolve_optimal_matches(
+        self, possible_teams: dict, month: str, overlap_sizes: dict = None
+    ) -> tuple:
+        """Finds the optimal match of every prior team with possible teams in a
+        month, see `find_optimal_match`. A team can only be matched once, so when
+        the optimal match of a prior team was already matched to another prior
+        team, or linked directly, the prior team is not matched and the
+        conflict is reported.
+
+        Args:
+            possible_teams (dict): prior team: list of possible teams
+            month (str): current month
+            overlap_sizes (dict, optional): (prior, team): number of shared team members
+                when the possible teams were found. Defaults to None.
+
+        Returns:
+            tuple: prior team: optimal match, and a list of conflicts with the
+            prior team, its optimal match and the prior team that claimed it
+            (None if the match was linked directly)
+        """
+        unmatched = set(self.new_teams_by_month[month])
+        claimed_by = {}
+        matches = {}
+        conflicts = []
+
+        for prior, teams in possible_teams.items():
+            # A prior team that was linked directly has new team members, so
+            # the stored overlap sizes no longer apply
+            if self.linked_teams[prior]["last_month_matched"] == month:
+                best_match = self.find_optimal_match(prior, teams, month)
+            else:
+                best_match = self.find_optimal_match(
+                    prior, teams, month, overlap_sizes
+                )
+
+            if not best_match:
+                continue
+
+            if best_match not in unmatched:
+                conflicts.append(
+                    {
+                        "prior": prior,
+                        "match": best_match,
+                        "claimed_by": claimed_by.get(best_match),
+                    }
+                )
+                continue
+
+            matches[prior] = best_match
+            claimed_by[best_match] = prior
+            unmatched.discard(best_match)
+
+        return matches, conflicts
+
+    def retire_teams(self, month: str):
+        """Moves the active teams that were not linked in a month to the
+        retired teams. A team that is not linked in a month has died and can
+        no longer be linked.
+
+        Args:
+            month (str): the month that was just linked
+        """
+        for k, v in list(self.active_teams.items()):
+            if v["last_month_matched"] != month:
+                self.retired_teams[k] = self.active_teams.pop(k)
+
+    def append_month(self, month: str, df: pd.DataFrame, grouped: bool = False):
+        """Adds the data of a new month, builds its teams and links them to the
+        linked teams. Only the new month is built and linked, so a new month of
+        data can be added to a saved state, see `save_state`. With compact
+        teams the new keys of the month are added with `extend_key_codes`.
+
+        Args:
+            month (str): the new month, it has to come after the months already linked
+            df (pd.DataFrame): data for the new month
+            grouped (bool, optional): use `build_grouped_team_dict`. Defaults to False.
+        """
+        if self.last_linked_month is not None and month <= self.last_linked_month:
+            raise ValueError(
+                "month {} must come after {}".format(month, self.last_linked_month)
+            )
+
+        month_list = self.month_list
+        if month not in month_list:
+            month_list = month_list + [month]
+        if self.last_linked_month is not None:
+            # link_month links a month to the month before it in month_list
+            previous_month = month_list[month_list.index(month) - 1]
+            if previous_month != self.last_linked_month:
+                raise ValueError(
+                    "month {} comes after {} in month_list, but the last linked "
+                    "month is {}".format(month, previous_month, self.last_linked_month)
+                )
+
+        self.df_dict[month] = df
+        self.month_list = month_list
+        if self.compact:
+            # New keys are coded after the existing keys, so the months
+            # already built keep their codes
+            self.key_codes = extend_key_codes(self.key_codes, df)
+
+        team_dict = self.load_cached_team_dict(month, grouped)
+        if team_dict is not None:
+            self.team_dicts_by_month[month] = team_dict
+        else:
+            print("building month - {}".format(month))
+            self.team_dicts_by_month[month] = build_month_team_dict(
+                df, grouped, self.hash_mode, self.key_codes, self.id_prefix(month)
+            )
+            self.save_cached_team_dict(month, grouped)
+
+        if self.last_linked_month is None:
+            self.start_linked_teams(month)
+        else:
+            self.link_month(month)
+
+    def link_stream(self, months, grouped: bool = False, window: int = 3) -> dict:
+        """Builds and links months one at a time from an iterator of
+        (month, pd.DataFrame), e.g. `utils.loaders.read_month_files`. Only the
+        data and supervisor indexes of the last `window` months are kept, so the
+        raw month data does not grow with the number of months. The team dicts,
+        linked_teams and retired_teams still keep every month, so they grow with
+        the number of months and the number of teams.
+
+        Args:
+            months (Iterable[tuple]): (month, pd.DataFrame) in month order
+            grouped (bool, optional): use `build_grouped_team_dict`. Defaults to False.
+            window (int, optional): number of months of data to keep. Linking a
+                month needs the previous month, so it must be at least 2. Defaults to 3.
+
+        Returns:
+            dict: a dict of all the teams that have been linked
+        """
+        if window < 2:
+            raise ValueError("window must be at least 2")
+
+        for month, df in months:
+            self.append_month(month, df, grouped)
+
+            # Drop the months that are no longer needed, keeping the window
+            # that ends at this month
+            month_index = self.month_list.index(month)
+            start = max(month_index - window + 1, 0)
+            keep = set(self.month_list[start : month_index + 1])
+            for old_month in [m for m in self.df_dict if m not in keep]:
+                del self.df_dict[old_month]
+            for old_month in [m for m in self.supervisor_indexes if m not in keep]:
+                del self.supervisor_indexes[old_month]
+
+        return self.linked_teams
+
+    def to_tables(self, month_keys: list = None) -> tuple:
+        """Flattens the linked teams into two tables. The team table has one row
+        per linked team and month with lineage_id (the key in linked_teams),
+        month, team_uid, supervisor, team_size and uic. The member table has one
+        row per linked team, month and team member with lineage_id, month and
+        MASTERKEY. Compact teams are converted back to MASTERKEYs. The teams of
+        each month are the same as in `build_teams_over_time`.
+
+        Args:
+            month_keys (list, optional): months in the order they are listed.
+                Defaults to None, which uses month_list.
+
+        Returns:
+            tuple: team table and member table as pd.DataFrame
+        """
+        if month_keys is None:
+            month_keys = self.month_list
+
+        lineage_ids = []
+        months = []
+        team_uids = []
+        uids_by_month = find_team_uids_by_month(
+            self.linked_teams, self.team_dicts_by_month, month_keys
+        )
+        for lineage_id, uids in zip(self.linked_teams, uids_by_month):
+            for month, uid in uids.items():
+                lineage_ids.append(lineage_id)
+                months.append(month)
+                team_uids.append(uid)
+
+        teams = [
+            self.team_dicts_by_month[month][uid]
+            for month, uid in zip(months, team_uids)
+        ]
+        supervisors = np.array([team["supervisor"] for team in teams])
+        team_members = [np.asarray(team["team_members"]) for team in teams]
+        members = (
+            np.concatenate(team_members) if team_members else np.array([], dtype=int)
+        )
+        if self.compact:
+            supervisors = self.key_codes[supervisors.astype(np.int64)]
+            members = self.key_codes[members.astype(np.int64)]
+
+        team_table = pd.DataFrame(
+            {
+                "lineage_id": lineage_ids,
+                "month": months,
+                "team_uid": team_uids,
+                "supervisor": supervisors,
+                "team_size": np.array([team["team_size"] for team in teams], dtype=int),
+                "uic": [list(team["uic"]) for team in teams],
+            }
+        )
+
+        sizes = [len(tm) for tm in team_members]
+        member_table = pd.DataFrame(
+            {
+                "lineage_id": np.repeat(np.array(lineage_ids, dtype=object), sizes),
+                "month": np.repeat(np.array(months, dtype=object), sizes),
+                "MASTERKEY": members,
+            }
+        )
+
+        return team_table, member_table
+
+    def write_parquet(self, directory: str):
+        """Writes the tables from `to_tables` to teams.parquet and members.parquet
+
+        Args:
+            directory (str): directory to write the tables to
+        """
+        team_table, member_table = self.to_tables()
+        os.makedirs(directory, exist_ok=True)
+        team_table.to_parquet(os.path.join(directory, "teams.parquet"), index=False)
+        member_table.to_parquet(
+            os.path.join(directory, "members.parquet"), index=False
+        )
+
+    def get_state(self) -> dict:
+        """Returns everything needed to keep linking new months. The monthly data
+        is left out, only the supervisor index of the last linked month is kept.
+
+        Returns:
+            dict: state of the linked teams
+        """
+        # The next month needs the supervisor index of the last linked month
+        if self.last_linked_month is not None:
+            self.get_supervisor_index(self.last_linked_month)
+
+        return {
+            "month_list": self.month_list,
+            "coordinated_cache_size": self.coordinated_cache_size,
+            "compact": self.compact,
+            "hash_mode": self.hash_mode,
+            "deterministic_ids": self.deterministic_ids,
+            "cache_dir": self.cache_dir,
+            "linking": self.linking,
+            "key_codes": self.key_codes,
+            "team_dicts_by_month": self.team_dicts_by_month,
+            "linked_teams": self.linked_teams,
+            "active_teams": self.active_teams,
+            "retired_teams": self.retired_teams,
+            "new_teams_by_month": self.new_teams_by_month,
+            "possible_teams": self.possible_teams,
+            "match_conflicts": self.match_conflicts,
+            "last_linked_month": self.last_linked_month,
+            "supervisor_indexes": {
+                month: index
+                for month, index in self.supervisor_indexes.items()
+                if month == self.last_linked_month
+            },
+        }
+
+    @classmethod
+    def from_state(cls, state: dict, df_dict: dict = None) -> "LinkedTeams":
+        """Creates linked teams from a state created by `get_state`
+
+        Args:
+            state (dict): state of the linked teams
+            df_dict (dict, optional): monthly data that is still needed. Defaults to None.
+
+        Returns:
+            LinkedTeams: the linked teams
+        """
+        linked_teams = cls(
+            {} if df_dict is None else df_dict,
+            state["month_list"],
+            coordinated_cache_size=state["coordinated_cache_size"],
+            compact=state["compact"],
+            hash_mode=state["hash_mode"],
+            deterministic_ids=state["deterministic_ids"],
+            cache_dir=state["cache_dir"],
+            linking=state["linking"],
+        )
+        for key in [
+            "key_codes",
+            "team_dicts_by_month",
+            "linked_teams",
+            "active_teams",
+            "retired_teams",
+            "new_teams_by_month",
+            "possible_teams",
+            "match_conflicts",
+            "last_linked_month",
+            "supervisor_indexes",
+        ]:
+            setattr(linked_teams, key, state[key])
+        return linked_teams
+
+    def save_state(self, path: str):
+        """Saves the state of the linked teams to a file. Requires
+        hash_mode="stable" as python hashes differ between processes.
+
+        Args:
+            path (str): file to save the state to
+        """
+        if self.hash_mode != "stable":
+            raise ValueError("save_state requires hash_mode='stable'")
+        # Write to a temporary file first so an interrupted save never leaves
+        # a partial file behind
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(self.get_state(), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load_state(cls, path: str, df_dict: dict = None) -> "LinkedTeams":
+        """Loads linked teams saved with `save_state`
+
+        Args:
+            path (str): file the state was saved to
+            df_dict (dict, optional): monthly data that is still needed. Defaults to None.
+
+        Returns:
+            LinkedTeams: the linked teams
+        """
+        with open(path, "rb") as f:
+            return cls.from_state(pickle.load(f), df_dict)
+
+    def build_linked_team_dict(
+        self, checkpoint_path: str = None, checkpoint_every: int = 12
+    ) -> dict:
         """This is the logic used to create linked teams
 
         Args:
-            team_dicts_by_month (dict): the teams found by month
+            checkpoint_path (str, optional): file the state is saved to while
+                linking, see `resume_linked_team_dict`. Defaults to None.
+            checkpoint_every (int, optional): number of months linked between
+                checkpoints. Defaults to 12.
 
         Returns:
             dict: a dict of all the teams that have been linked
         """
         # self.team_dicts_by_month = team_dicts_by_month
+        self.check_checkpoint_options(checkpoint_path, checkpoint_every)
         month_keys = sorted(self.team_dicts_by_month)
 
-        # Create the initial set of teams
+        self.start_linked_teams(month_keys[0])
+
+        return self.resume_linked_team_dict(checkpoint_path, checkpoint_every)
+
+    def resume_linked_team_dict(
+        self, checkpoint_path: str = None, checkpoint_every: int = 12
+    ) -> dict:
+        """Links the months that come after the last linked month. Used to
+        continue from a checkpoint loaded with `load_state`, which gives the
+        same linked teams as a run that was not interrupted.
+
+        Args:
+            checkpoint_path (str, optional): file the state is saved to while
+                linking. Defaults to None.
+            checkpoint_every (int, optional): number of months linked between
+                checkpoints. Defaults to 12.
+
+        Returns:
+            dict: a dict of all the teams that have been linked
+        """
+        self.check_checkpoint_options(checkpoint_path, checkpoint_every)
+        if self.last_linked_month is None:
+            raise ValueError(
+                "no month has been linked, use build_linked_team_dict to start linking"
+            )
+        month_keys = [
+            month
+            for month in sorted(self.team_dicts_by_month)
+            if month > self.last_linked_month
+        ]
+
+        for month_count, month in enumerate(month_keys, start=1):
+            self.link_month(month)
+
+            if checkpoint_path is not None:
+                if month_count % checkpoint_every == 0 or month == month_keys[-1]:
+                    print("saving checkpoint - {}".format(month))
+                    self.save_state(checkpoint_path)
+
+        return self.linked_teams
+
+    def check_checkpoint_options(self, checkpoint_path: str, checkpoint_every: int):
+        """Checks the checkpoint options before any month is linked, so a run
+        does not fail at its first checkpoint
+
+        Args:
+            checkpoint_path (str): file the state is saved to while linking
+            checkpoint_every (int): number of months linked between checkpoints
+        """
+        if checkpoint_path is None:
+            return
+        if self.hash_mode != "stable":
+            raise ValueError("checkpoint_path requires hash_mode='stable'")
+        if checkpoint_every < 1:
+            raise ValueError("checkpoint_every must be at least 1")
+
+    def start_linked_teams(self, start_month: str):
+        """Creates the initial set of linked teams from the teams of the first month
+
+        Args:
+            start_month (str): the first month
+        """
         self.linked_teams = {}
-        start_month = month_keys[0]
+        # Teams that can still be linked and teams that died. Every linked
+        # team is in self.linked_teams and in one of these two dicts
+        self.active_teams = {}
+        self.retired_teams = {}
         for uid in self.team_dicts_by_month[start_month].keys():
             self.linked_teams[uid] = create_linked_team(
                 self.team_dicts_by_month, start_month, uid
             )
+            self.active_teams[uid] = self.linked_teams[uid]
+
+        self.new_teams_by_month = {}
+        self.possible_teams = {}
+        self.match_conflicts = {}
+        self.last_linked_month = start_month
+
+    def link_month(self, month: str):
+        """Links the teams of a month to the linked teams of the previous month.
+        Teams that are not linked are added as new linked teams.
+
+        Args:
+            month (str): the month to link
+        """
+        print("linking month - {}".format(month))
+
+        month_index = self.month_list.index(month)
+        last_month = self.month_list[month_index - 1]
 
         # Used to check if an unmatched team
         # Can be matched using a Jaccard Index
-        new_teams_by_month = {}
-        month_count = 1
-        possible_teams = {}
-        for month in month_keys[1:]:
-            print("linking month - {}".format(month))
-
-            # TODO can this help with a coordinated move with supervisor
-            self.last_supes = set(
-                self.df_dict[month_keys[month_count - 1]][
-                    "SUPERVISOR MASTERKEY"
-                ].to_list()
+        new_teams_by_month = self.new_teams_by_month
+        possible_teams = self.possible_teams
+
+        # create the month key for new teams and initialize as an empty dict
+        # The dit will consist of uid: team_make_up
+        new_teams_by_month[month] = {}
+
+        possible_teams[month] = {}
+        # Number of shared team members for each (prior, possible team)
+        possible_overlaps = {}
+
+        # Index the teams linked the previous month, teams that were not
+        # linked the previous month died and have been retired
+        live_teams = list(self.active_teams)
+        team_order = {k: idx for idx, k in enumerate(live_teams)}
+        member_index, hash_index, supervisor_index = build_linked_team_index(
+            self.linked_teams, live_teams
+        )
+        # Team members of the live teams, a team is no longer checked
+        # this month once it has been linked
+        prior_teams = {
+            k: set(member_list(self.linked_teams[k]["last_team_members"]))
+            for k in live_teams
+        }
+
+        new_keys = list(self.team_dicts_by_month[month])
+        new_teams = {
+            key: set(member_list(self.team_dicts_by_month[month][key]["team_members"]))
+            for key in new_keys
+        }
+
+        # Overlap counts of every live team and new team pair
+        if self.linking == "sparse":
+            overlap_matrix = build_overlap_matrix(
+                [prior_teams[k] for k in live_teams],
+                [new_teams[key] for key in new_keys],
             )
-            self.new_supes = set(self.df_dict[month]["SUPERVISOR MASTERKEY"].to_list())
 
-            month_count += 1
-            # create the month key for new teams and initialize as an empty dict
-            # The dit will consist of uid: team_make_up
-            new_teams_by_month[month] = {}
+        # iterate through the teams in a given month
+        # for key, value in self.team_dicts_by_month[month].items():
+        for col, key in enumerate(new_keys):
+            # This is used to keep track of if the team is matched
+            matched = False
 
-            possible_teams[month] = {}
+            possible_new_team = new_teams[key]
 
-            month_index = self.month_list.index(month)
-            last_month = self.month_list[month_index - 1]
-
-            # iterate through the teams in a given month
-            # for key, value in self.team_dicts_by_month[month].items():
-            for key in self.team_dicts_by_month[month].keys():
-                # This is used to keep track of if the team is matched
-                matched = False
-
-                # iterate through the team to check for matching criteria
-                for k, v in self.linked_teams.items():
-
-                    # Check if the team was linked the previous month
-                    # If not you want to pass over it because it died
-                    if v["last_month_matched"] == last_month:
-                        # keep track of new teams that could be linked if
-                        # on criteria is not met.
-
-                        # Check to see if two or more team members left the team
-                        prior_team = set(self.linked_teams[k]["last_team_members"])
-                        possible_new_team = set(
-                            self.team_dicts_by_month[month][key]["team_members"]
+            # Only linked teams sharing a member, the hash or the supervisor
+            # can meet any of the criteria. They are checked in the same
+            # order as self.linked_teams
+            candidates = set(
+                hash_index.get(self.team_dicts_by_month[month][key]["hash"], [])
+            )
+            if self.linking == "sparse":
+                start, end = overlap_matrix.indptr[col], overlap_matrix.indptr[col + 1]
+                overlap_sizes = {
+                    live_teams[row]: count
+                    for row, count in zip(
+                        overlap_matrix.indices[start:end].tolist(),
+                        overlap_matrix.data[start:end].tolist(),
+                    )
+                }
+                candidates.update(overlap_sizes)
+            else:
+                overlap_sizes = None
+                candidates.update(
+                    supervisor_index.get(
+                        self.team_dicts_by_month[month][key]["supervisor"], []
+                    )
+                )
+                for member in possible_new_team:
+                    candidates.update(member_index.get(member, []))
+
+            # iterate through the team to check for matching criteria
+            for k in sorted(candidates, key=team_order.get):
+                v = self.linked_teams[k]
+
+                # Check if the team was linked the previous month
+                # If not you want to pass over it because it died
+                if v["last_month_matched"] == last_month:
+                    # keep track of new teams that could be linked if
+                    # on criteria is not met.
+
+                    # Check to see if two or more team members left the team
+                    prior_team = prior_teams[k]
+
+                    # The sizes of the overlap and of the symmetric difference
+                    if overlap_sizes is not None:
+                        overlap_size = overlap_sizes.get(k, 0)
+                    else:
+                        overlap_size = len(prior_team.intersection(possible_new_team))
+                    diff_size = len(prior_team) + len(possible_new_team) - 2 * overlap_size
+
+                    # link if the hash matches, i.e. same team composition
+                    if (
+                        self.team_dicts_by_month[month][key]["hash"]
+                        == self.linked_teams[k]["last_hash"]
+                    ):
+                        self.linked_teams[k] = update_team(
+                            self.linked_teams[k],
+                            self.team_dicts_by_month[month][key],
                         )
-
-                        team_departed = prior_team - prior_team.intersection(
-                            possible_new_team
+                        self.linked_teams[k]["last_month_matched"] = month
+                        self.linked_teams[k]["team_uuids"].append(key)
+                        matched = True
+                        break
+
+                    # Link if they have the same team membership
+                    elif same_members(
+                        self.team_dicts_by_month[month][key]["team_members"],
+                        self.linked_teams[k]["last_team_members"],
+                    ):
+                        # Have the same supervisor and different UICs as this could signal a reorganization at UIC level
+
+                        self.linked_teams[k] = update_team(
+                            self.linked_teams[k],
+                            self.team_dicts_by_month[month][key],
                         )
-
-                        team_diff = prior_team ^ possible_new_team
-                        team_overlap = prior_team.intersection(possible_new_team)
-                        team_arrival = possible_new_team - prior_team
-
-                        # link if the hash matches, i.e. same team composition
+                        self.linked_teams[k]["last_month_matched"] = month
+                        self.linked_teams[k]["team_uuids"].append(key)
+                        matched = True
+                        break
+
+                    # Checks if the team difference is less than 2 and that they
+                    # Have the same supervisor, if the supervisor is not equal
+                    # there could be a coordinated departure
+                    elif diff_size < 2:
                         if (
-                            self.team_dicts_by_month[month][key]["hash"]
-                            == self.linked_teams[k]["last_hash"]
+                            self.team_dicts_by_month[month][key]["supervisor"]
+                            == self.linked_teams[k]["last_supervisor"]
                         ):
                             self.linked_teams[k] = update_team(
                                 self.linked_teams[k],
@@ -334,105 +1603,88 @@ class LinkedTeams:
                             self.linked_teams[k]["last_month_matched"] = month
                             self.linked_teams[k]["team_uuids"].append(key)
                             matched = True
+
                             break
 
-                        # Link if they have the same team membership
-                        elif (
-                            self.team_dicts_by_month[month][key]["team_members"]
-                            == self.linked_teams[k]["last_team_members"]
-                        ):
-                            # Have the same supervisor and different UICs as this could signal a reorganization at UIC level
+                    # this looks to see if there is some overlap between the possible
+                    # teams and makes a list, that can be use later for identifying
+                    # possible work unit links
 
-                            self.linked_teams[k] = update_team(
-                                self.linked_teams[k],
-                                self.team_dicts_by_month[month][key],
-                            )
-                            self.linked_teams[k]["last_month_matched"] = month
-                            self.linked_teams[k]["team_uuids"].append(key)
-                            matched = True
-                            break
+                    elif overlap_size > 0:
+                        team_departed = prior_team - possible_new_team
+                        team_arrival = possible_new_team - prior_team
 
-                        # Checks if the team difference is less than 2 and that they
-                        # Have the same supervisor, if the supervisor is not equal
-                        # there could be a coordinated departure
-                        elif len(team_diff) < 2:
-                            if (
-                                self.team_dicts_by_month[month][key]["supervisor"]
-                                == self.linked_teams[k]["last_supervisor"]
-                            ):
-                                self.linked_teams[k] = update_team(
-                                    self.linked_teams[k],
-                                    self.team_dicts_by_month[month][key],
-                                )
-                                self.linked_teams[k]["last_month_matched"] = month
-                                self.linked_teams[k]["team_uuids"].append(key)
-                                matched = True
-
-                                break
-
-                        # this looks to see if there is some overlap between the possible
-                        # teams and makes a list, that can be use later for identifying
-                        # possible work unit links
-
-                        elif len(team_overlap) > 0:
-                            # This looks at month t+1 to make sure the difference did not
-                            # go to the same team
-                            coordinated = self.determine_coordinated(
-                                list(team_departed), month
+                        # This looks at month t+1 to make sure the difference did not
+                        # go to the same team
+                        coordinated = self.determine_coordinated(
+                            list(team_departed), month
+                        )
+                        # Check if those that left are coordinated, i.e. go to same team
+                        if not coordinated:
+                            coordinated_arrival = self.determine_coordinated(
+                                list(team_arrival), month, departure=False
                             )
-                            # Check if those that left are coordinated, i.e. go to same team
-                            if not coordinated:
-                                coordinated_arrival = self.determine_coordinated(
-                                    list(team_arrival), month, departure=False
-                                )
-                                if not coordinated_arrival:
-                                    if k not in possible_teams[month]:
-                                        possible_teams[month][k] = [key]
-                                    else:
-                                        possible_teams[month][k].append(key)
-
-                        if matched == True:
-                            break
+                            if not coordinated_arrival:
+                                if k not in possible_teams[month]:
+                                    possible_teams[month][k] = [key]
+                                else:
+                                    possible_teams[month][k].append(key)
+                                possible_overlaps[(k, key)] = overlap_size
+
+                    if matched == True:
+                        break
+
+            # If the team is not linked to a previous team append it to the list for that month
+            if matched == False:
+                new_teams_by_month[month][key] = self.team_dicts_by_month[month][
+                    key
+                ]
+
+        # Go through possible matched and identify if
+        # there is an optimal match based on the provide criteria.
+        matches, self.match_conflicts[month] = self.resolve_optimal_matches(
+            possible_teams[month], month, possible_overlaps
+        )
+        if self.match_conflicts[month]:
+            print(
+                "conflicting matches - {} - {}".format(
+                    month, len(self.match_conflicts[month])
+                )
+            )
 
-                # If the team is not linked to a previous team append it to the list for that month
-                if matched == False:
-                    new_teams_by_month[month][key] = self.team_dicts_by_month[month][
-                        key
-                    ]
-
-            # Go through possible matched and identify if
-            # there is an optimal match based on the provide criteria.
-            for k, v in possible_teams[month].items():
-                best_match = self.find_optimal_match(k, v, month)
-                if best_match:
-                    self.linked_teams[k] = update_team(
-                        self.linked_teams[k],
-                        self.team_dicts_by_month[month][best_match],
-                    )
-                    self.linked_teams[k]["last_month_matched"] = month
-                    self.linked_teams[k]["team_uuids"].append(best_match)
-                    matched = True
+        for k, best_match in matches.items():
+            self.linked_teams[k] = update_team(
+                self.linked_teams[k],
+                self.team_dicts_by_month[month][best_match],
+            )
+            self.linked_teams[k]["last_month_matched"] = month
+            self.linked_teams[k]["team_uuids"].append(best_match)
 
-                    new_teams_by_month[month].pop(best_match)
+            new_teams_by_month[month].pop(best_match)
 
-            # Add unmatched teams as new team
-            current_uids = list(self.linked_teams.keys())
+        # Retire the teams that were not linked this month
+        self.retire_teams(month)
 
-            for uid in new_teams_by_month[month].keys():
-                # if uid is not in the current uids, add
-                if uid not in current_uids:
-                    self.linked_teams[uid] = create_linked_team(
-                        new_teams_by_month, month, uid
-                    )
-                    current_uids.append(uid)
-                # if uid is in current uids, generate new uid until it is not
-                else:
-                    new_uid = str(uuid.uuid4()).replace("-", "")[:10]
-                    while new_uid in current_uids:
-                        new_uid = str(uuid.uuid4()).replace("-", "")[:10]
-                    self.linked_teams[new_uid] = create_linked_team(
-                        new_teams_by_month, month, uid
-                    )
-                    current_uids.append(new_uid)
+        # Add unmatched teams as new team, self.linked_teams holds every
+        # uid in use
+        id_allocator = TeamIdAllocator(
+            "{}-linked".format(month) if self.deterministic_ids else None
+        )
+
+        for uid in new_teams_by_month[month].keys():
+            # if uid is not in the current uids, add
+            if uid not in self.linked_teams:
+                self.linked_teams[uid] = create_linked_team(
+                    new_teams_by_month, month, uid
+                )
+                self.active_teams[uid] = self.linked_teams[uid]
+            # if uid is in current uids, generate new uid until it is not
+            else:
+                new_uid = id_allocator.new_id(self.linked_teams)
+                self.linked_teams[new_uid] = create_linked_team(
+                    new_teams_by_month, month, uid
+                )
+                self.active_teams[new_uid] = self.linked_teams[new_uid]
+
+        self.last_linked_month = month
 
-        return self.linked_teams
@@ -1,32 +1,97 @@
+import pandas as pd
+from typing import Union
+
+TEAM_FIELDS = ["supervisor", "team_members", "uic", "team_size", "hash"]
+
+
 def build_teams_over_time(
-    linked_teams: dict, team_dicts_by_month: dict, month_keys: list
-) -> dict:
+    linked_teams: dict,
+    team_dicts_by_month: dict,
+    month_keys: list,
+    long_format: bool = False,
+) -> Union[dict, pd.DataFrame]:
     """creates the teams over time
 
     Args:
         linked_teams (dict): set of linked teams
         team_dicts_by_month (dict): team dictionaries by month
         month_keys (list): lis tof months
+        long_format (bool, optional): return a pd.DataFrame with one row per
+            team and month instead of a dict. Defaults to False.
 
     Returns:
-        dict: teams over time
+        Union[dict, pd.DataFrame]: teams over time
     """
     teams_over_time = {}
-    team_num = 0
-    for value in linked_teams.values():
-        teams_over_time[team_num] = {}
-
-        for key in month_keys:
-            for uid in value["team_uuids"]:
-                try:
-                    temp = {key: team_dicts_by_month[key][uid]}
-                    teams_over_time[team_num] = {
-                        **teams_over_time[team_num],
-                        **temp,
-                    }
-                    break
-                except:
-                    continue
-
-        team_num += 1
+    for team_num, uids in enumerate(
+        find_team_uids_by_month(linked_teams, team_dicts_by_month, month_keys)
+    ):
+        teams_over_time[team_num] = {
+            key: team_dicts_by_month[key][uid] for key, uid in uids.items()
+        }
+
+    if long_format:
+        return teams_over_time_to_frame(teams_over_time)
     return teams_over_time
+
+
+def find_team_uids_by_month(
+    linked_teams: dict, team_dicts_by_month: dict, month_keys: list
+) -> list:
+    """Finds the team uid of each linked team in each month. The first uid of
+    the linked team found in a month is used.
+
+    Args:
+        linked_teams (dict): set of linked teams
+        team_dicts_by_month (dict): team dictionaries by month
+        month_keys (list): list of months, the order of the months in the result
+
+    Returns:
+        list: month: uid for each linked team, in the order of linked_teams
+    """
+    # Find the months each uid is found in once, instead of looking
+    # every uid up in every month
+    month_position = {}
+    uid_months = {}
+    for key in month_keys:
+        if key not in team_dicts_by_month or key in month_position:
+            continue
+        month_position[key] = len(month_position)
+        for uid in team_dicts_by_month[key]:
+            uid_months.setdefault(uid, []).append(key)
+
+    uids_by_month = []
+    for value in linked_teams.values():
+        found = {}
+        for uid in value["team_uuids"]:
+            for key in uid_months.get(uid, []):
+                if key not in found:
+                    found[key] = uid
+
+        uids_by_month.append(
+            {key: found[key] for key in sorted(found, key=month_position.get)}
+        )
+
+    return uids_by_month
+
+
+def teams_over_time_to_frame(teams_over_time: dict) -> pd.DataFrame:
+    """Flattens teams over time to a pd.DataFrame with one row per team and month
+
+    Args:
+        teams_over_time (dict): teams over time from `build_teams_over_time`
+
+    Returns:
+        pd.DataFrame: team, month and the fields of the team for that month
+    """
+    columns = {"team": [], "month": []}
+    columns.update({field: [] for field in TEAM_FIELDS})
+
+    for team_num, teams in teams_over_time.items():
+        for month, team in teams.items():
+            columns["team"].append(team_num)
+            columns["month"].append(month)
+            for field in TEAM_FIELDS:
+                columns[field].append(team[field])
+
+    return pd.DataFrame(columns)
@@ -0,0 +1,142 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Iterator
+
+TEAM_COLUMNS = ["MASTERKEY", "SUPERVISOR MASTERKEY", "UIC"]
+
+
+def read_month_files(directory: str) -> Iterator[tuple]:
+    """Reads one month of data at a time from a directory with one file per
+    month. The file name without the extension is used as the month, e.g.
+    `20120131.csv`. CSV, pickle and parquet files are supported. Months are
+    read in sorted order, so only one month is held in memory by the reader.
+
+    Args:
+        directory (str): directory with one file per month
+
+    Yields:
+        Iterator[tuple]: (month, pd.DataFrame)
+    """
+    readers = {
+        ".csv": pd.read_csv,
+        ".pkl": pd.read_pickle,
+        ".pickle": pd.read_pickle,
+        ".parquet": pd.read_parquet,
+    }
+
+    files = {}
+    for file_name in os.listdir(directory):
+        month, extension = os.path.splitext(file_name)
+        if extension in readers:
+            files[month] = file_name
+
+    for month in sorted(files):
+        extension = os.path.splitext(files[month])[1]
+        yield month, readers[extension](os.path.join(directory, files[month]))
+
+
+def read_parquet_months(
+    path: str, months: list = None, month_column: str = "month"
+) -> Iterator[tuple]:
+    """Reads one month at a time from a parquet dataset partitioned by month,
+    e.g. `path/month=20120131/part-0.parquet`. Only the MASTERKEY,
+    SUPERVISOR MASTERKEY and UIC columns are read and files are memory
+    mapped. See `compact_team_columns` for the dtypes.
+
+    Args:
+        path (str): directory of the partitioned parquet dataset
+        months (list, optional): months to read. Defaults to None, which reads every month.
+        month_column (str, optional): name of the partition column. Defaults to "month".
+
+    Yields:
+        Iterator[tuple]: (month, pd.DataFrame) in sorted month order
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.fs as fs
+    except ImportError as e:
+        raise ImportError("reading parquet months requires pyarrow") from e
+
+    # Months are read as strings, e.g. "20120131", the same as the keys of df_dict
+    dataset = ds.dataset(
+        path,
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(month_column, pa.string())]), flavor="hive"
+        ),
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+    if months is None:
+        months = set()
+        for fragment in dataset.get_fragments():
+            keys = ds.get_partition_keys(fragment.partition_expression)
+            months.add(str(keys[month_column]))
+
+    for month in sorted(months):
+        table = dataset.to_table(
+            columns=TEAM_COLUMNS, filter=ds.field(month_column) == month
+        )
+        yield month, compact_team_columns(table.to_pandas())
+
+
+def load_parquet_months(
+    path: str, months: list = None, month_column: str = "month"
+) -> dict:
+    """Loads a parquet dataset partitioned by month into the dict of
+    pd.DataFrames used by `LinkedTeams`, see `read_parquet_months`
+
+    Args:
+        path (str): directory of the partitioned parquet dataset
+        months (list, optional): months to read. Defaults to None, which reads every month.
+        month_column (str, optional): name of the partition column. Defaults to "month".
+
+    Returns:
+        dict: month: pd.DataFrame
+    """
+    return dict(read_parquet_months(path, months, month_column))
+
+
+def compact_team_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Keeps the MASTERKEY, SUPERVISOR MASTERKEY and UIC columns with compact
+    dtypes. Keys become int32 when every key is a whole number that fits in
+    int32, otherwise they are left as int64 or float64 so no key is changed.
+    A missing supervisor is kept as NaN, so SUPERVISOR MASTERKEY stays float64
+    when it has missing values. UIC becomes categorical.
+
+    Args:
+        df (pd.DataFrame): One month of data
+
+    Returns:
+        pd.DataFrame: One month of data with compact dtypes
+    """
+    df = df[TEAM_COLUMNS].copy()
+    for col in ["MASTERKEY", "SUPERVISOR MASTERKEY"]:
+        df[col] = compact_key_column(df[col])
+    df["UIC"] = df["UIC"].astype("category")
+    return df
+
+
+def compact_key_column(keys: pd.Series) -> pd.Series:
+    """Converts a key column to int32 when it can be done without changing
+    any key
+
+    Args:
+        keys (pd.Series): MASTERKEY or SUPERVISOR MASTERKEY column
+
+    Returns:
+        pd.Series: keys as int32, int64 or float64
+    """
+    if not pd.api.types.is_numeric_dtype(keys):
+        return keys
+
+    values = keys.dropna()
+    whole = (values == values.round()).all()
+    int32 = np.iinfo(np.int32)
+    in_range = values.empty or (values.min() >= int32.min and values.max() <= int32.max)
+
+    if keys.notna().all() and whole:
+        return keys.astype("int32" if in_range else "int64")
+    return keys.astype("float64")
@@ -0,0 +1,134 @@
+import pandas as pd
+
+from utils.build_teams import LinkedTeams
+
+
+def build_transition_records(
+    linked_teams: LinkedTeams, ocs_column: str = None, ocs_df_dict: dict = None
+) -> pd.DataFrame:
+    """Finds every move of a person from one linked team to another between
+    consecutive months. Linked teams are numbered in the order of
+    linked_teams, the same numbering as `build_teams_over_time`, and months
+    are numbered by their position in the sorted months.
+
+    A move is following when the team the person moved to already has another
+    person who was a member of the team the person left in an earlier month.
+
+    Args:
+        linked_teams (LinkedTeams): linked teams after `build_linked_team_dict`
+        ocs_column (str, optional): column with the occupational series of each
+            person, used to add the (from, to) OCS of each move. Defaults to None.
+        ocs_df_dict (dict, optional): month: pd.DataFrame with MASTERKEY and
+            ocs_column. Defaults to None, which uses linked_teams.df_dict.
+
+    Returns:
+        pd.DataFrame: i, j, month, person, following and, with an ocs_column,
+        ocs_from and ocs_to
+    """
+    _, member_table = linked_teams.to_tables()
+
+    month_position = {
+        month: idx
+        for idx, month in enumerate(sorted(linked_teams.team_dicts_by_month))
+    }
+    team_number = {
+        lineage_id: idx for idx, lineage_id in enumerate(linked_teams.linked_teams)
+    }
+    members = pd.DataFrame(
+        {
+            "team": member_table["lineage_id"].map(team_number).astype(int),
+            "month": member_table["month"].map(month_position).astype(int),
+            "person": member_table["MASTERKEY"],
+        }
+    ).drop_duplicates()
+
+    # People in team i in month t - 1 and team j in month t
+    prior = members.assign(month=members["month"] + 1).rename(columns={"team": "i"})
+    current = members.rename(columns={"team": "j"})
+    records = prior.merge(current, on=["person", "month"])
+    records = records[records["i"] != records["j"]]
+    records = records[["i", "j", "month", "person"]].reset_index(drop=True)
+
+    # First month each person was a member of each team
+    first_month = (
+        members.groupby(["team", "person"], sort=False)["month"]
+        .min()
+        .reset_index()
+        .rename(columns={"team": "i", "person": "teammate", "month": "first_month"})
+    )
+
+    # Other people in team j when the person arrived, who were in team i before
+    teammates = records.reset_index().merge(
+        current.rename(columns={"person": "teammate"}), on=["j", "month"]
+    )
+    teammates = teammates[teammates["teammate"] != teammates["person"]]
+    teammates = teammates.merge(first_month, on=["i", "teammate"])
+    following = teammates.loc[
+        teammates["first_month"] < teammates["month"], "index"
+    ].unique()
+
+    records["following"] = 0
+    records.loc[following, "following"] = 1
+
+    if ocs_column is not None:
+        if ocs_df_dict is None:
+            ocs_df_dict = linked_teams.df_dict
+        ocs = pd.concat(
+            [
+                df[["MASTERKEY", ocs_column]]
+                .drop_duplicates("MASTERKEY")
+                .assign(month=month_position[month])
+                for month, df in ocs_df_dict.items()
+                if month in month_position
+            ]
+        ).rename(columns={"MASTERKEY": "person", ocs_column: "ocs"})
+
+        records = records.merge(
+            ocs.assign(month=ocs["month"] + 1).rename(columns={"ocs": "ocs_from"}),
+            on=["person", "month"],
+            how="left",
+        ).merge(
+            ocs.rename(columns={"ocs": "ocs_to"}), on=["person", "month"], how="left"
+        )
+
+    return records
+
+
+def build_tr_df(records: pd.DataFrame, kind: str = "following") -> pd.DataFrame:
+    """Converts transition records to the tr_df used in
+    `calculations/utils/excess_probabilities.py`, with the columns i, j and one
+    column per month, named by the month number as a string. A month column
+    holds (person, following) for kind="following" or (ocs_from, ocs_to) for
+    kind="ocs". The moves of a pair are packed into rows: the k-th move of a
+    (i, j) in a month is in row k of that (i, j), so a pair has as many rows
+    as its most moves in one month and the other cells are NaN.
+
+    Args:
+        records (pd.DataFrame): records from `build_transition_records`
+        kind (str, optional): "following" or "ocs". Defaults to "following".
+
+    Returns:
+        pd.DataFrame: tr_df
+    """
+    if kind == "following":
+        values = list(zip(records["person"], records["following"]))
+    elif kind == "ocs":
+        values = list(zip(records["ocs_from"], records["ocs_to"]))
+    else:
+        raise ValueError("kind must be 'following' or 'ocs'")
+
+    cells = pd.DataFrame(
+        {
+            "i": records["i"].to_numpy(),
+            "j": records["j"].to_numpy(),
+            "month": records["month"].astype(str).to_numpy(),
+            "value": pd.Series(values, dtype=object).to_numpy(),
+        }
+    )
+    cells["k"] = cells.groupby(["i", "j", "month"]).cumcount()
+
+    tr_df = cells.set_index(["i", "j", "k", "month"])["value"].unstack("month")
+    tr_df = tr_df[sorted(tr_df.columns, key=int)]
+    tr_df.columns.name = None
+
+    return tr_df.reset_index().drop(columns="k")